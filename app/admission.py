@@ -0,0 +1,183 @@
+# Admission control: a per-worker concurrency limit and a bounded FIFO
+# queue for each class of route. Requests beyond what the connection pool
+# can serve wait here, briefly, instead of piling up on pool checkouts;
+# when the queue is full or the wait passes its deadline the request is
+# shed straight away with 503 and Retry-After.
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+import orjson
+from starlette.routing import Match
+
+from app import metrics
+from app.config import settings
+
+ADMITTED = "admitted"
+QUEUED = "queued"
+SHED_QUEUE_FULL = "shed_queue_full"
+SHED_DEADLINE = "shed_deadline"
+
+logger = logging.getLogger(__name__)
+
+# Route templates (after API_PREFIX) whose class the rules below would get wrong
+ROUTE_CLASSES = {
+    "/stats/": "lookup",  # maintained counters: constant time
+}
+
+
+def route_class(method: str, template: str) -> Optional[str]:
+    """Limiter class of a route template, or None for routes not limited"""
+    if not template.startswith(settings.API_PREFIX):
+        return None  # /health, /metrics, docs: must answer under load
+    path = template[len(settings.API_PREFIX):]
+    if path in ROUTE_CLASSES:
+        return ROUTE_CLASSES[path]
+    if method not in ("GET", "HEAD"):
+        return "write"
+    if path.endswith("/export"):
+        return "export"
+    if "/overdue" in path or path.endswith(("/search", "/summary")):
+        return "expensive"
+    if path.endswith("}"):
+        return "lookup"  # GET /{id}
+    return "list"
+
+
+class Limiter:
+    """At most ``limit`` requests at once, ``queue_size`` more waiting up to ``timeout`` seconds"""
+
+    def __init__(self, name: str, limit: int, queue_size: int, timeout: float):
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> str:
+        """Take a slot, waiting in line if needed; returns how it went (shed: no slot)"""
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return ADMITTED
+        if len(self._waiters) >= self.queue_size:
+            return SHED_QUEUE_FULL
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.timeout)
+            return QUEUED
+        except asyncio.TimeoutError:
+            if waiter.done():
+                return QUEUED  # handed a slot just as the deadline passed
+            self._forget(waiter)
+            return SHED_DEADLINE
+        except asyncio.CancelledError:
+            # The client went away while waiting
+            if waiter.done():
+                self.release()
+            else:
+                self._forget(waiter)
+            raise
+
+    def release(self) -> None:
+        # Hand the slot straight to the longest waiter, if there is one
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def _forget(self, waiter: asyncio.Future) -> None:
+        waiter.cancel()
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+
+
+def build_limiters() -> Dict[str, Limiter]:
+    # Admitted requests beyond the pool would wait on a checkout after all
+    pool_limit = settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW
+    concurrent = sum(limit for limit, _ in settings.ADMISSION_LIMITS.values())
+    if concurrent > pool_limit:
+        logger.warning(
+            "ADMISSION_LIMITS admit %d requests at once but the pool has %d connections "
+            "(DB_POOL_SIZE + DB_MAX_OVERFLOW); admitted requests may wait on a checkout",
+            concurrent, pool_limit,
+        )
+    return {
+        name: Limiter(name, limit, queue_size, settings.ADMISSION_QUEUE_TIMEOUT)
+        for name, (limit, queue_size) in settings.ADMISSION_LIMITS.items()
+    }
+
+
+class AdmissionMiddleware:
+    """ASGI middleware applying the limiter of each request's route class"""
+
+    def __init__(self, app, router, limiters: Dict[str, Limiter]):
+        self.app = app
+        self.router = router
+        self.limiters = limiters
+
+    def limiter_for(self, scope) -> Optional[Limiter]:
+        # Same matching the router does next; the template keeps ids out
+        for route in self.router.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                name = route_class(scope["method"], getattr(route, "path", ""))
+                return self.limiters.get(name) if name else None
+        return None
+
+    async def __call__(self, scope, receive, send):
+        limiter = self.limiter_for(scope) if scope["type"] == "http" else None
+        if limiter is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        result = await limiter.acquire()
+        metrics.admission_requests.inc(limiter.name, result)
+        if result == QUEUED:
+            metrics.admission_queue_wait.observe(time.perf_counter() - start, limiter.name)
+        elif result != ADMITTED:
+            await _send_busy(send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release()
+
+
+async def _send_busy(send) -> None:
+    body = orjson.dumps({"detail": "Server busy, retry later"})
+    await send({
+        "type": "http.response.start",
+        "status": 503,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(settings.ADMISSION_RETRY_AFTER).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+def limiter_metrics(limiters: Dict[str, Limiter]) -> List[str]:
+    """In-flight and queued requests per route class, for /metrics"""
+    return metrics.gauge_lines(
+        "admission_in_flight", "Requests holding an admission slot",
+        {(("route_class", name),): limiter.active for name, limiter in limiters.items()},
+    ) + metrics.gauge_lines(
+        "admission_queued", "Requests waiting for an admission slot",
+        {(("route_class", name),): limiter.queued for name, limiter in limiters.items()},
+    )
@@ -1,13 +1,15 @@
 #  fixing the bugs here
 
 from fastapi import APIRouter
-from .routes import book, members, loans
+from .routes import books, members, loans, admin, stats
 
 api_router = APIRouter()
 
-api_router.include_router(book.router)
+api_router.include_router(books.router)
 api_router.include_router(members.router)
 api_router.include_router(loans.router)
+api_router.include_router(admin.router)
+api_router.include_router(stats.router)
 
 # Export the router so it can be imported from app.api
 __all__ = ['api_router']
\ No newline at end of file
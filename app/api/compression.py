@@ -0,0 +1,63 @@
+# Response compression negotiated on the Accept-Encoding header. zstd when
+# the optional zstandard package is installed and the client accepts it,
+# else gzip. Bodies under the size threshold go out as they are; streamed
+# bodies (the exports) are compressed chunk by chunk.
+
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipResponder, IdentityResponder
+
+from app.api.negotiation import qualities
+
+try:
+    import zstandard
+except ImportError:  # optional: only gzip is offered then
+    zstandard = None
+
+
+class ZstdResponder(IdentityResponder):
+    content_encoding = "zstd"
+
+    def __init__(self, app, minimum_size: int, level: int = 3):
+        super().__init__(app, minimum_size)
+        self.compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def apply_compression(self, body: bytes, *, more_body: bool) -> bytes:
+        body = self.compressor.compress(body)
+        if not more_body:
+            body += self.compressor.flush()
+        return body
+
+
+def choose_encoding(accept_encoding: str) -> str:
+    """The first of zstd, gzip the client accepts, else identity"""
+    accepted = qualities(accept_encoding)
+    for coding in ("zstd", "gzip"):
+        if coding == "zstd" and zstandard is None:
+            continue
+        if accepted.get(coding, accepted.get("*", 0)) > 0:
+            return coding
+    return "identity"
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing responses of at least ``minimum_size`` bytes"""
+
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, zstd_level: int = 3):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.zstd_level = zstd_level
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        coding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if coding == "zstd":
+            responder = ZstdResponder(self.app, self.minimum_size, self.zstd_level)
+        elif coding == "gzip":
+            responder = GZipResponder(self.app, self.minimum_size, compresslevel=self.gzip_level)
+        else:
+            responder = IdentityResponder(self.app, self.minimum_size)
+        await responder(scope, receive, send)
@@ -0,0 +1,84 @@
+# Conditional GETs: weak ETags (and Last-Modified for single entities)
+# built from crud Versions, answered with 304 before any row is serialised
+
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, Optional
+
+from fastapi import Request, Response, status
+
+from app.crud.versions import Version
+
+
+class Validators:
+    """ETag and, when it is trustworthy, Last-Modified of a response"""
+
+    def __init__(
+        self, version: Version, last_modified: bool = True, representation: Optional[str] = None
+    ):
+        stamp = version.last_modified.isoformat() if version.last_modified else ""
+        key = (version.rows, version.id_sum, version.revisions, stamp, representation)
+        digest = hashlib.blake2b(repr(key).encode(), digest_size=12).hexdigest()
+        self.etag = f'W/"{digest}"'
+        # Negotiated responses (see negotiation.list_format) differ by Accept
+        self.representation = representation
+        # A deleted row leaves no timestamp behind, so listings only get an ETag
+        self.last_modified = _utc(version.last_modified) if last_modified else None
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        headers = {"ETag": self.etag}
+        if self.representation is not None:
+            headers["Vary"] = "Accept"
+        if self.last_modified is not None:
+            headers["Last-Modified"] = format_datetime(self.last_modified, usegmt=True)
+        return headers
+
+
+def _utc(value: Optional[datetime]) -> Optional[datetime]:
+    if value is None:
+        return None
+    # SQLite returns naive CURRENT_TIMESTAMP values, which are UTC
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc, microsecond=0)
+    return value.astimezone(timezone.utc).replace(microsecond=0)
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    # Weak comparison: W/"x" and "x" are the same tag
+    if header.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in header.split(","))
+
+
+def is_fresh(request: Request, validators: Validators) -> bool:
+    """True if the client's copy is current (If-None-Match wins over If-Modified-Since)"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, validators.etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None or validators.last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return validators.last_modified <= since
+
+
+def not_modified(
+    request: Request, validators: Validators, response: Optional[Response] = None
+) -> Optional[Response]:
+    """
+    A 304 response if the client's copy is current. Otherwise None, after
+    putting the validators on ``response`` (if given) for the full reply.
+    """
+    if is_fresh(request, validators):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=validators.headers)
+    if response is not None:
+        response.headers.update(validators.headers)
+    return None
@@ -0,0 +1,67 @@
+# Streaming NDJSON / CSV exports fed by server-side cursors
+
+import csv
+import io
+from typing import AsyncIterator, Callable, List, Sequence
+
+import orjson
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.database.db import SessionLocal
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+Partitions = Callable[[AsyncSession], AsyncIterator[Sequence]]
+
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return value
+
+
+def _encode_ndjson(rows) -> bytes:
+    return b"".join(orjson.dumps(dict(row)) + b"\n" for row in rows)
+
+
+def _encode_csv(lines) -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(lines)
+    return buffer.getvalue().encode("utf-8")
+
+
+def export_response(
+    partitions: Partitions,
+    columns: List[str],
+    fmt: str,
+    filename: str,
+    sessions: async_sessionmaker = SessionLocal,
+) -> StreamingResponse:
+    """
+    Stream every row produced by ``partitions`` as NDJSON or CSV.
+
+    The generator opens its own session from ``sessions``: the request's
+    ``get_db`` session is closed before a streaming body starts being sent.
+    """
+
+    async def body():
+        if fmt == "csv":
+            yield _encode_csv([columns])
+        async with sessions() as db:
+            async for rows in partitions(db):
+                if fmt == "csv":
+                    yield _encode_csv([_csv_value(row[column]) for column in columns] for row in rows)
+                else:
+                    yield _encode_ndjson(rows)
+
+    return StreamingResponse(
+        body(),
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{fmt}"'},
+    )
@@ -0,0 +1,103 @@
+# Incremental parsing of streamed NDJSON / CSV request bodies
+
+import csv
+import json
+from typing import AsyncIterator, Optional, Tuple, Union
+
+NDJSON = "ndjson"
+CSV = "csv"
+
+
+def detect_format(content_type: str) -> str:
+    """Pick the body format from a Content-Type header (NDJSON by default)"""
+    media_type = content_type.split(";")[0].strip().lower()
+    if media_type in ("text/csv", "application/csv"):
+        return CSV
+    return NDJSON
+
+
+INVALID_UTF8 = "invalid UTF-8"
+
+
+def _decode(line: bytes) -> Optional[str]:
+    try:
+        return line.decode("utf-8").rstrip("\r")
+    except UnicodeDecodeError:
+        return None
+
+
+async def iter_lines(stream: AsyncIterator[bytes]) -> AsyncIterator[Optional[str]]:
+    """
+    Split a byte stream into text lines without buffering the whole body;
+    a line that is not valid UTF-8 comes out as None
+    """
+    buffer = b""
+    async for chunk in stream:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield _decode(line)
+    if buffer:
+        yield _decode(buffer)
+
+
+async def iter_records(
+    stream: AsyncIterator[bytes], fmt: str
+) -> AsyncIterator[Tuple[int, Union[dict, str]]]:
+    """
+    Yield (row number, record) pairs; the record is an error message
+    instead of a dict when the row cannot be parsed. Rows are numbered
+    from 1 and do not count blank lines or the CSV header.
+    """
+    row = 0
+    if fmt == NDJSON:
+        async for line in iter_lines(stream):
+            if line is None:
+                row += 1
+                yield row, INVALID_UTF8
+                continue
+            if not line.strip():
+                continue
+            row += 1
+            try:
+                record = json.loads(line)
+            except ValueError as exc:
+                yield row, f"invalid JSON: {exc}"
+                continue
+            if not isinstance(record, dict):
+                yield row, "expected a JSON object"
+                continue
+            yield row, record
+        return
+
+    header = None
+    pending = ""
+    async for line in iter_lines(stream):
+        if line is None:
+            # The record it belongs to is lost (with any lines already pending)
+            pending = ""
+            if header is None:
+                yield row + 1, f"{INVALID_UTF8} in the CSV header"
+                return
+            row += 1
+            yield row, INVALID_UTF8
+            continue
+        # A quoted field may span lines: keep reading until quotes balance
+        pending = f"{pending}\n{line}" if pending else line
+        if pending.count('"') % 2:
+            continue
+        text, pending = pending, ""
+        if not text.strip():
+            continue
+        values = next(csv.reader([text]))
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        row += 1
+        if len(values) != len(header):
+            yield row, f"expected {len(header)} columns, got {len(values)}"
+            continue
+        # Empty cells mean "not given" so model defaults apply
+        yield row, {name: value for name, value in zip(header, values) if value != ""}
+    if pending:
+        yield row + 1, "unterminated quoted field"
@@ -0,0 +1,67 @@
+# Content negotiation: Accept-Encoding for the compression middleware and
+# Accept for the compact list representations
+
+import importlib.util
+from typing import Dict, Sequence
+
+from fastapi import Request
+
+JSON = "json"
+COLUMNS = "columns"
+MSGPACK = "msgpack"
+
+# Offered media types, most preferred first on a tie
+LIST_MEDIA_TYPES = {
+    "application/json": JSON,
+    "application/vnd.library.columns+json": COLUMNS,
+    "application/vnd.msgpack": MSGPACK,
+    "application/msgpack": MSGPACK,
+    "application/x-msgpack": MSGPACK,
+}
+
+# msgpack is optional; without it those media types are simply not offered
+HAVE_MSGPACK = importlib.util.find_spec("msgpack") is not None
+
+
+def qualities(header: str) -> Dict[str, float]:
+    """Lower-cased tokens of an Accept-style header with their q-values"""
+    result = {}
+    for item in header.split(","):
+        token, *params = item.split(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        result[token] = q
+    return result
+
+
+def best_media_type(header: str, offered: Sequence[str]) -> str:
+    """The offered type the client prefers: highest q, then most specific match"""
+    accept = qualities(header or "*/*")
+    best, best_rank = offered[0], None
+    for index, media_type in enumerate(offered):
+        major = media_type.split("/")[0]
+        for pattern, specificity in ((media_type, 2), (f"{major}/*", 1), ("*/*", 0)):
+            if pattern in accept:
+                rank = (accept[pattern], specificity, -index)
+                if accept[pattern] > 0 and (best_rank is None or rank > best_rank):
+                    best, best_rank = media_type, rank
+                break
+    return best
+
+
+def list_format(request: Request) -> str:
+    """JSON, COLUMNS or MSGPACK; plain JSON unless the client asked for another"""
+    offered = [
+        media_type for media_type, fmt in LIST_MEDIA_TYPES.items()
+        if fmt != MSGPACK or HAVE_MSGPACK
+    ]
+    return LIST_MEDIA_TYPES[best_media_type(request.headers.get("accept", ""), offered)]
@@ -0,0 +1,65 @@
+# Opaque keyset cursors for the listing endpoints
+
+import base64
+import json
+from typing import Any, Callable, Optional, Tuple
+
+from fastapi import HTTPException, status
+
+
+def encode_cursor(last_id: int, sort_key: Any = None) -> str:
+    """Encode the last row on a page (its id, plus its sort key if the
+    listing is not ordered by id alone) as an opaque cursor"""
+    payload = {"id": last_id}
+    if sort_key is not None:
+        payload["key"] = sort_key
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode(cursor: str) -> dict:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded))
+        if not isinstance(payload["id"], int):
+            raise ValueError
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid pagination cursor"
+        )
+    return payload
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[int]:
+    """Return the id a cursor points after, or None for the first page"""
+    if not cursor:
+        return None
+    return _decode(cursor)["id"]
+
+
+def decode_keyset_cursor(
+    cursor: Optional[str], parse_key: Callable[[Any], Any] = lambda key: key
+) -> Optional[Tuple[Any, int]]:
+    """Return the (sort key, id) a cursor points after, or None for the first page"""
+    if not cursor:
+        return None
+    payload = _decode(cursor)
+    try:
+        return parse_key(payload["key"]), payload["id"]
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid pagination cursor"
+        )
+
+
+def page_of(rows, limit: int, sort_key: Optional[Callable[[Any], Any]] = None) -> dict:
+    """Build a page from up to ``limit + 1`` rows fetched in keyset order"""
+    rows = list(rows)
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last.id, sort_key(last) if sort_key else None)
+    return {"items": rows, "next_cursor": next_cursor}
@@ -0,0 +1,70 @@
+# Fast JSON responses for endpoints that already select exactly the
+# response columns, so the rows need no response-model validation, and the
+# compact columnar / msgpack representations of the list endpoints
+
+from datetime import date
+from typing import Any, Dict, Iterable, Sequence, Type
+
+import orjson
+from fastapi.responses import Response
+from pydantic import BaseModel
+
+from app.api import negotiation
+
+try:
+    import msgpack
+except ImportError:  # optional: msgpack is then not offered (see negotiation)
+    msgpack = None
+
+
+class RowsResponse(Response):
+    """JSON encoded with orjson; UTC datetimes end in "Z" like pydantic's"""
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_UTC_Z)
+
+
+class ColumnsResponse(RowsResponse):
+    media_type = "application/vnd.library.columns+json"
+
+
+def _msgpack_default(value: Any) -> Any:
+    # Dates as the same ISO strings the JSON representations carry
+    if isinstance(value, date):
+        text = value.isoformat()
+        return text[:-6] + "Z" if text.endswith("+00:00") else text
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+class MsgpackResponse(Response):
+    media_type = "application/vnd.msgpack"
+
+    def render(self, content: Any) -> bytes:
+        return msgpack.packb(content, default=_msgpack_default)
+
+
+def row_dicts(rows: Iterable) -> list:
+    """Result rows as plain dicts, ready for orjson"""
+    return [row._asdict() for row in rows]
+
+
+def columnar(items: Iterable, columns: Sequence[str]) -> Dict[str, list]:
+    """Rows (ORM objects or result rows) as field names once plus one value list per row"""
+    return {
+        "columns": list(columns),
+        "rows": [[getattr(item, column) for column in columns] for item in items],
+    }
+
+
+def compact_response(
+    fmt: str, items: Iterable, model: Type[BaseModel], headers: Dict[str, str], **extra: Any
+) -> Response:
+    """
+    A listing in a compact representation: ``columnar`` rows with the
+    fields of ``model``, plus ``extra`` keys such as a page's next_cursor.
+    """
+    content = {**columnar(items, list(model.model_fields)), **extra}
+    response_class = MsgpackResponse if fmt == negotiation.MSGPACK else ColumnsResponse
+    return response_class(content, headers=headers)
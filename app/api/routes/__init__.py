@@ -1,4 +1,4 @@
 # Solve the problem
-from . import book, members, loans
+from . import books, members, loans, admin, stats
 
-__all__ = ['book', 'members', 'loans']
\ No newline at end of file
+__all__ = ['books', 'members', 'loans', 'admin', 'stats']
\ No newline at end of file
@@ -0,0 +1,22 @@
+from fastapi import APIRouter, status
+from typing import List
+from app.database.db import slow_query_log
+from app.schemas.admin import SlowQuery
+
+router = APIRouter(
+    prefix="/admin",
+    tags=["admin"],
+)
+
+
+@router.get("/slow-queries", response_model=List[SlowQuery])
+async def read_slow_queries(limit: int = 100):
+    """
+    Most recent slow queries, newest first, with sampled query plans.
+    """
+    return slow_query_log.entries()[:limit]
+
+
+@router.delete("/slow-queries", status_code=status.HTTP_204_NO_CONTENT)
+async def clear_slow_queries():
+    slow_query_log.clear()
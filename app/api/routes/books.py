@@ -1,9 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from pydantic import ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
-from app.database.db import get_db
-from app.schemas.book import BookCreate, BookUpdate, BookResponse
+from app.database.db import get_db, get_read_db, read_sessions
+from app.dependencies import batch_ids
+from app.models.models import Book
+from app.schemas.book import (
+    BookCreate, BookUpdate, BookResponse, BookImportResult, BookImportRow,
+)
+from app.schemas.pagination import Page
+from app.api.pagination import decode_cursor, page_of
+from app.api.export import export_response
+from app.api import conditional, ingest, negotiation
+from app.api.responses import compact_response
 from app.crud import book as book_crud
+from app.crud import search as search_crud
+from app.crud import versions
 
 router = APIRouter(
     prefix="/books",
@@ -12,56 +24,211 @@ router = APIRouter(
 
 
 @router.post("/", response_model=BookResponse, status_code=status.HTTP_201_CREATED)
-def create_book(
+async def create_book(
     book: BookCreate,
     db: AsyncSession = Depends(get_db)
 ):
-    db_book = book_crud.get_book_by_isbn(db, isbn=book.isbn)
+    db_book = await book_crud.get_book_by_isbn(db, isbn=book.isbn)
     if db_book:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Book with ISBN {book.isbn} already exists"
         )
-    return book_crud.create_book(db=db, book=book)
+    return await book_crud.create_book(db=db, book=book)
+
+
+@router.post("/bulk", response_model=BookImportResult)
+async def import_books(
+    request: Request,
+    format: Optional[str] = Query(None, pattern="^(ndjson|csv)$"),
+    chunk_size: int = Query(1000, ge=1, le=10000),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Import books from a streamed NDJSON or CSV body (one book per line/row).
+    The format comes from `format` or the Content-Type header. Rows are
+    inserted and committed in chunks; existing ISBNs are reported as duplicates.
+    """
+    fmt = format or ingest.detect_format(request.headers.get("content-type", ""))
+    summary = BookImportResult()
+    chunk = []
+
+    async def flush():
+        ids = await book_crud.create_books_bulk(db, [book for _, book in chunk])
+        for (row, book), book_id in zip(chunk, ids):
+            if book_id is None:
+                summary.duplicates += 1
+                summary.rows.append(BookImportRow(row=row, status="duplicate", isbn=book.isbn))
+            else:
+                summary.created += 1
+                summary.rows.append(BookImportRow(row=row, status="created", isbn=book.isbn, id=book_id))
+        chunk.clear()
+
+    async for row, record in ingest.iter_records(request.stream(), fmt):
+        try:
+            if isinstance(record, str):
+                raise ValueError(record)
+            book = BookCreate(**record)
+        except ValidationError as exc:
+            error = "; ".join(
+                f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in exc.errors()
+            )
+        except ValueError as exc:
+            error = str(exc)
+        else:
+            chunk.append((row, book))
+            if len(chunk) >= chunk_size:
+                await flush()
+            continue
+        summary.invalid += 1
+        # Echo the ISBN back whatever its JSON type, so the row can be found
+        isbn = record.get("isbn") if isinstance(record, dict) else None
+        summary.rows.append(BookImportRow(
+            row=row, status="invalid",
+            isbn=None if isbn is None else str(isbn),
+            error=error,
+        ))
+    if chunk:
+        await flush()
+
+    summary.rows.sort(key=lambda result: result.row)
+    return summary
 
 
 @router.get("/", response_model=List[BookResponse])
-def read_books(
+async def read_books(
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
     title: Optional[str] = None,
     author: Optional[str] = None,
     available: Optional[bool] = None,
-    db: AsyncSession = Depends(get_db)
+    ids: Optional[List[int]] = Depends(batch_ids),
+    db: AsyncSession = Depends(get_read_db)
 ):
-    books = book_crud.get_books(
-        db, skip=skip, limit=limit, 
-        title=title, author=author, available=available
+    """
+    List books, or with `ids=1,2,3` fetch exactly those books (in that order)
+    in one query; the other filters are then ignored.
+    """
+    fmt = negotiation.list_format(request)
+    if ids is not None:
+        books = await book_crud.get_books_by_ids(db, ids)
+        validators = conditional.Validators(
+            versions.entities_version(books, "created_at", "updated_at"),
+            last_modified=False, representation=fmt
+        )
+        cached = conditional.not_modified(request, validators, response)
+        if cached is not None:
+            return cached
+        if fmt != negotiation.JSON:
+            return compact_response(fmt, books, BookResponse, validators.headers)
+        return books
+
+    filters = dict(skip=skip, limit=limit, title=title, author=author, available=available)
+    validators = conditional.Validators(
+        await book_crud.get_books_version(db, **filters),
+        last_modified=False, representation=fmt
     )
+    cached = conditional.not_modified(request, validators, response)
+    if cached is not None:
+        return cached
+    books = await book_crud.get_books(db, **filters)
+    if fmt != negotiation.JSON:
+        return compact_response(fmt, books, BookResponse, validators.headers)
     return books
 
 
+@router.get("/page", response_model=Page[BookResponse])
+async def read_books_page(
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    title: Optional[str] = None,
+    author: Optional[str] = None,
+    available: Optional[bool] = None,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Cursor-paginated listing; pass `next_cursor` back as `cursor` for the next page.
+    """
+    filters = dict(
+        limit=limit + 1, after_id=decode_cursor(cursor) or 0,
+        title=title, author=author, available=available
+    )
+    fmt = negotiation.list_format(request)
+    validators = conditional.Validators(
+        await book_crud.get_books_version(db, **filters),
+        last_modified=False, representation=fmt
+    )
+    cached = conditional.not_modified(request, validators, response)
+    if cached is not None:
+        return cached
+    page = page_of(await book_crud.get_books(db, **filters), limit)
+    if fmt != negotiation.JSON:
+        return compact_response(fmt, page.pop("items"), BookResponse, validators.headers, **page)
+    return page
+
+
+@router.get("/export")
+async def export_books(
+    request: Request,
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+):
+    """
+    Stream every book as NDJSON or CSV in constant memory.
+    """
+    return export_response(
+        book_crud.stream_books,
+        [column.name for column in Book.__table__.columns],
+        format,
+        "books",
+        sessions=read_sessions(request),
+    )
+
+
+@router.get("/search", response_model=List[BookResponse])
+async def search_books(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Search books by title or author, most relevant first.
+    """
+    return await search_crud.search_books(db, q=q, limit=limit)
+
+
 @router.get("/{book_id}", response_model=BookResponse)
-def read_book(
+async def read_book(
     book_id: int,
-    db: AsyncSession = Depends(get_db)
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_read_db)
 ):
-    db_book = book_crud.get_book(db, book_id=book_id)
+    db_book = await book_crud.get_book(db, book_id=book_id)
     if db_book is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Book not found"
         )
+    validators = conditional.Validators(
+        versions.entity_version(db_book, "created_at", "updated_at")
+    )
+    cached = conditional.not_modified(request, validators, response)
+    if cached is not None:
+        return cached
     return db_book
 
 
 @router.put("/{book_id}", response_model=BookResponse)
-def update_book(
+async def update_book(
     book_id: int,
     book: BookUpdate,
     db: AsyncSession = Depends(get_db)
 ):
-    db_book = book_crud.get_book(db, book_id=book_id)
+    db_book = await book_crud.get_book(db, book_id=book_id)
     if db_book is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -70,25 +237,25 @@ def update_book(
     
     # If ISBN is being updated, check it doesn't conflict
     if book.isbn and book.isbn != db_book.isbn:
-        existing_book = book_crud.get_book_by_isbn(db, isbn=book.isbn)
+        existing_book = await book_crud.get_book_by_isbn(db, isbn=book.isbn)
         if existing_book:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"Book with ISBN {book.isbn} already exists"
             )
     
-    return book_crud.update_book(db=db, book_id=book_id, book=book)
+    return await book_crud.update_book(db=db, book_id=book_id, book=book)
 
 
 @router.delete("/{book_id}", response_model=BookResponse)
-def delete_book(
+async def delete_book(
     book_id: int,
     db: AsyncSession = Depends(get_db)
 ):
-    db_book = book_crud.get_book(db, book_id=book_id)
+    db_book = await book_crud.get_book(db, book_id=book_id)
     if db_book is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Book not found"
         )
-    return book_crud.delete_book(db=db, book_id=book_id)
\ No newline at end of file
+    return await book_crud.delete_book(db=db, book_id=book_id)
\ No newline at end of file
@@ -1,12 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from datetime import date
-from app.database.db import get_db
-from app.schemas.loan import LoanCreate, LoanUpdate, LoanResponse, LoanDetailResponse
+from functools import partial
+from app.database.db import get_db, get_read_db, read_sessions
+from app.models.models import Loan
+from app.schemas.loan import (
+    LoanBatchCreate, LoanCreate, LoanUpdate, LoanResponse, LoanDetailResponse, OverdueSummary,
+)
+from app.schemas.pagination import Page
+from app.api.pagination import decode_cursor, decode_keyset_cursor, page_of
+from app.api import conditional, negotiation
+from app.api.export import export_response
+from app.api.responses import RowsResponse, compact_response, row_dicts
 from app.crud import loan as loan_crud
-from app.crud import book as book_crud
-from app.crud import member as member_crud
 
 router = APIRouter(
     prefix="/loans",
@@ -15,163 +22,266 @@ router = APIRouter(
 
 
 @router.post("/", response_model=LoanResponse, status_code=status.HTTP_201_CREATED)
-def create_loan(
+async def create_loan(
     loan: LoanCreate,
     db: AsyncSession = Depends(get_db)
 ):
-
-    book =  book_crud.get_book(db, book_id=loan.book_id)
-    if not book:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Book with ID {loan.book_id} not found"
-        )
-    if not book.available:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Book with ID {loan.book_id} is not available for loan"
-        )
-    member = member_crud.get_member(db, member_id=loan.member_id)
-    if not member:
+    try:
+        return await loan_crud.create_loan(db=db, loan=loan)
+    except loan_crud.CheckoutError as exc:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Member with ID {loan.member_id} not found"
+            status_code=status.HTTP_404_NOT_FOUND if exc.not_found else status.HTTP_400_BAD_REQUEST,
+            detail=exc.detail
         )
-    if not member.active:
+
+
+@router.post("/batch", response_model=List[LoanResponse], status_code=status.HTTP_201_CREATED)
+async def create_loans(
+    batch: LoanBatchCreate,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Check several books out to one member in one transaction; if any book
+    cannot be loaned, none is.
+    """
+    try:
+        return await loan_crud.create_loans(db=db, batch=batch)
+    except loan_crud.CheckoutError as exc:
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Member with ID {loan.member_id} is not active"
+            status_code=status.HTTP_404_NOT_FOUND if exc.not_found else status.HTTP_400_BAD_REQUEST,
+            detail=exc.detail
         )
-    
-    return loan_crud.create_loan(db=db, loan=loan)
 
 
 @router.get("/", response_model=List[LoanDetailResponse])
-def read_loans(
+async def read_loans(
+    request: Request,
     skip: int = 0,
     limit: int = 100,
     member_id: Optional[int] = None,
     book_id: Optional[int] = None,
     is_returned: Optional[bool] = None,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
-    loans =  loan_crud.get_loans(
-        db, skip=skip, limit=limit,
+    filters = dict(
+        skip=skip, limit=limit,
         member_id=member_id, book_id=book_id, 
         is_returned=is_returned
     )
-    result = []
-    for loan in loans:
-        loan_dict = {
-            "id": loan.id,
-            "book_id": loan.book_id,
-            "member_id": loan.member_id,
-            "loan_date": loan.loan_date,
-            "due_date": loan.due_date,
-            "return_date": loan.return_date,
-            "created_at": loan.created_at,
-            "updated_at": loan.updated_at,
-            "book_title": loan.book.title if loan.book else "Unknown Book",
-            "member_name": f"{loan.member.first_name} {loan.member.last_name}" if loan.member else "Unknown Member"
-        }
-        result.append(loan_dict)
-    
-    return result
+    fmt = negotiation.list_format(request)
+    validators = conditional.Validators(
+        await loan_crud.get_loans_version(db, **filters),
+        last_modified=False, representation=fmt
+    )
+    cached = conditional.not_modified(request, validators)
+    if cached is not None:
+        return cached
+    loans = await loan_crud.get_loans(db, **filters)
+    if fmt != negotiation.JSON:
+        return compact_response(fmt, loans, LoanDetailResponse, validators.headers)
+    return RowsResponse(row_dicts(loans), headers=validators.headers)
+
+
+@router.get("/page", response_model=Page[LoanDetailResponse])
+async def read_loans_page(
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    member_id: Optional[int] = None,
+    book_id: Optional[int] = None,
+    is_returned: Optional[bool] = None,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Cursor-paginated listing; pass `next_cursor` back as `cursor` for the next page.
+    """
+    filters = dict(
+        limit=limit + 1, after_id=decode_cursor(cursor) or 0,
+        member_id=member_id, book_id=book_id,
+        is_returned=is_returned
+    )
+    fmt = negotiation.list_format(request)
+    validators = conditional.Validators(
+        await loan_crud.get_loans_version(db, **filters),
+        last_modified=False, representation=fmt
+    )
+    cached = conditional.not_modified(request, validators)
+    if cached is not None:
+        return cached
+    page = page_of(await loan_crud.get_loans(db, **filters), limit)
+    if fmt != negotiation.JSON:
+        return compact_response(fmt, page.pop("items"), LoanDetailResponse, validators.headers, **page)
+    page["items"] = row_dicts(page["items"])
+    return RowsResponse(page, headers=validators.headers)
+
+
+@router.get("/export")
+async def export_loans(
+    request: Request,
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+):
+    """
+    Stream every loan as NDJSON or CSV in constant memory.
+    """
+    return export_response(
+        loan_crud.stream_loans,
+        [column.name for column in Loan.__table__.columns],
+        format,
+        "loans",
+        sessions=read_sessions(request),
+    )
 
 
 @router.get("/overdue", response_model=List[LoanDetailResponse])
-def read_overdue_loans(
+async def read_overdue_loans(
+    request: Request,
     current_date: Optional[date] = None,
-    db: AsyncSession = Depends(get_db)
+    limit: int = Query(100, ge=1, le=1000),
+    db: AsyncSession = Depends(get_read_db)
 ):
+    """
+    The first `limit` overdue loans, oldest due date first. Use
+    `/overdue/page` to walk all of them, or `/overdue/export` to stream them.
+    """
     if current_date is None:
         current_date = date.today()
         
-    loans = loan_crud.get_overdue_loans(db, current_date=current_date)
-    
-    result = []
-    for loan in loans:
-        loan_dict = {
-            "id": loan.id,
-            "book_id": loan.book_id,
-            "member_id": loan.member_id,
-            "loan_date": loan.loan_date,
-            "due_date": loan.due_date,
-            "return_date": loan.return_date,
-            "created_at": loan.created_at,
-            "updated_at": loan.updated_at,
-            "book_title": loan.book.title if loan.book else "Unknown Book",
-            "member_name": f"{loan.member.first_name} {loan.member.last_name}" if loan.member else "Unknown Member"
-        }
-        result.append(loan_dict)
+    filters = dict(current_date=current_date, limit=limit)
+    validators = conditional.Validators(
+        await loan_crud.get_overdue_loans_version(db, **filters), last_modified=False
+    )
+    cached = conditional.not_modified(request, validators)
+    if cached is not None:
+        return cached
+    loans = await loan_crud.get_overdue_loans(db, **filters)
     
-    return result
+    return RowsResponse(row_dicts(loans), headers=validators.headers)
+
+
+@router.get("/overdue/page", response_model=Page[LoanDetailResponse])
+async def read_overdue_loans_page(
+    request: Request,
+    current_date: Optional[date] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Overdue loans, oldest due date first, one page at a time.
+    """
+    if current_date is None:
+        current_date = date.today()
+
+    filters = dict(
+        current_date=current_date, limit=limit + 1,
+        after=decode_keyset_cursor(cursor, date.fromisoformat),
+    )
+    validators = conditional.Validators(
+        await loan_crud.get_overdue_loans_version(db, **filters), last_modified=False
+    )
+    cached = conditional.not_modified(request, validators)
+    if cached is not None:
+        return cached
+    loans = await loan_crud.get_overdue_loans(db, **filters)
+    page = page_of(loans, limit, sort_key=lambda loan: loan.due_date.isoformat())
+    page["items"] = row_dicts(page["items"])
+    return RowsResponse(page, headers=validators.headers)
+
+
+@router.get("/overdue/export")
+async def export_overdue_loans(
+    request: Request,
+    current_date: Optional[date] = None,
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+):
+    """
+    Stream every overdue loan, with book title and member name, as NDJSON or CSV.
+    """
+    if current_date is None:
+        current_date = date.today()
+
+    return export_response(
+        partial(loan_crud.stream_overdue_loans, current_date=current_date),
+        [column.name for column in Loan.__table__.columns] + ["book_title", "member_name"],
+        format,
+        "overdue_loans",
+        sessions=read_sessions(request),
+    )
+
+
+@router.get("/overdue/summary", response_model=OverdueSummary)
+async def read_overdue_summary(
+    current_date: Optional[date] = None,
+    group_by: str = Query("member", pattern="^(member|days)$"),
+    limit: int = Query(100, ge=1, le=1000),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Overdue counts grouped by member (largest first) or by days overdue.
+    Aggregated in the database; no loan rows are loaded.
+    """
+    if current_date is None:
+        current_date = date.today()
+
+    summary = {
+        "current_date": current_date,
+        "total": await loan_crud.count_overdue_loans(db, current_date),
+    }
+    if group_by == "member":
+        summary["by_member"] = await loan_crud.overdue_counts_by_member(db, current_date, limit=limit)
+    else:
+        summary["by_days"] = await loan_crud.overdue_counts_by_days(db, current_date)
+    return summary
 
 
 @router.get("/{loan_id}", response_model=LoanDetailResponse)
-def read_loan(
+async def read_loan(
     loan_id: int,
-    db: AsyncSession = Depends(get_db)
+    request: Request,
+    db: AsyncSession = Depends(get_read_db)
 ):
-    loan = loan_crud.get_loan(db, loan_id=loan_id)
+    # The cheap version query answers 404s and 304s; only a changed loan is loaded
+    version = await loan_crud.get_loan_version(db, loan_id=loan_id)
+    validators = conditional.Validators(version)
+    if version.rows:
+        cached = conditional.not_modified(request, validators)
+        if cached is not None:
+            return cached
+    loan = await loan_crud.get_loan_detail(db, loan_id=loan_id) if version.rows else None
     if loan is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Loan not found"
         )
     
-    return {
-        "id": loan.id,
-        "book_id": loan.book_id,
-        "member_id": loan.member_id,
-        "loan_date": loan.loan_date,
-        "due_date": loan.due_date,
-        "return_date": loan.return_date,
-        "created_at": loan.created_at,
-        "updated_at": loan.updated_at,
-        "book_title": loan.book.title if loan.book else "Unknown Book",
-        "member_name": f"{loan.member.first_name} {loan.member.last_name}" if loan.member else "Unknown Member"
-    }
+    return RowsResponse(loan._asdict(), headers=validators.headers)
 
 
 @router.put("/{loan_id}", response_model=LoanDetailResponse)
-def update_loan(
+async def update_loan(
     loan_id: int,
     loan_update: LoanUpdate,
     db: AsyncSession = Depends(get_db)
 ):
-    loan =  loan_crud.get_loan(db, loan_id=loan_id)
-    if loan is None:
+    updated_loan = await loan_crud.update_loan(db=db, loan_id=loan_id, loan_update=loan_update)
+    if updated_loan is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Loan not found"
         )
-    
-    updated_loan =  loan_crud.update_loan(db=db, loan_id=loan_id, loan_update=loan_update)
-    return {
-        "id": updated_loan.id,
-        "book_id": updated_loan.book_id,
-        "member_id": updated_loan.member_id,
-        "loan_date": updated_loan.loan_date,
-        "due_date": updated_loan.due_date,
-        "return_date": updated_loan.return_date,
-        "created_at": updated_loan.created_at,
-        "updated_at": updated_loan.updated_at,
-        "book_title": updated_loan.book.title if updated_loan.book else "Unknown Book",
-        "member_name": f"{updated_loan.member.first_name} {updated_loan.member.last_name}" if updated_loan.member else "Unknown Member"
-    }
+    return RowsResponse(updated_loan._asdict())
 
 
 @router.delete("/{loan_id}", response_model=LoanResponse)
-def delete_loan(
+async def delete_loan(
     loan_id: int,
     db: AsyncSession = Depends(get_db)
 ):
-    loan = loan_crud.get_loan(db, loan_id=loan_id)
+    loan = await loan_crud.get_loan(db, loan_id=loan_id)
     if loan is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Loan not found"
         )
-    return loan_crud.delete_loan(db=db, loan_id=loan_id)
+    return await loan_crud.delete_loan(db=db, loan_id=loan_id)
 
@@ -1,9 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
-from app.database.db import get_db
-from app.schemas.member import MemberCreate, MemberUpdate, MemberResponse
+from datetime import date
+from app.database.db import get_db, get_read_db, read_sessions
+from app.dependencies import batch_ids
+from app.models.models import Member
+from app.schemas.members import MemberCreate, MemberUpdate, MemberResponse, MemberSummary
+from app.schemas.pagination import Page
+from app.api.pagination import decode_cursor, page_of
+from app.api import conditional, negotiation
+from app.api.responses import compact_response
+from app.api.export import export_response
 from app.crud import member as member_crud
+from app.crud import search as search_crud
+from app.crud import versions
 router = APIRouter(
     prefix="/members",
     tags=["members"],
@@ -11,59 +21,188 @@ router = APIRouter(
 
 
 @router.post("/", response_model=MemberResponse, status_code=status.HTTP_201_CREATED)
-def create_member(
+async def create_member(
     member: MemberCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Register a new member in the library system.
     """
     # Check if member with same email already exists
-    db_member = member_crud.get_member_by_email(db, email=member.email)
+    db_member = await member_crud.get_member_by_email(db, email=member.email)
     if db_member:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Member with email {member.email} already exists"
         )
-    return member_crud.create_member(db=db, member=member)
+    return await member_crud.create_member(db=db, member=member)
 
 
 @router.get("/", response_model=List[MemberResponse])
-def read_members(
+async def read_members(
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
     active: Optional[bool] = None,
     name: Optional[str] = None,
-    db: Session = Depends(get_db)
+    ids: Optional[List[int]] = Depends(batch_ids),
+    db: AsyncSession = Depends(get_read_db)
 ):
-    members = member_crud.get_members(
-        db, skip=skip, limit=limit, 
-        active=active, name=name
+    """
+    List members, or with `ids=1,2,3` fetch exactly those members (in that order)
+    in one query; the other filters are then ignored.
+    """
+    fmt = negotiation.list_format(request)
+    if ids is not None:
+        members = await member_crud.get_members_by_ids(db, ids)
+        validators = conditional.Validators(
+            versions.entities_version(members, "updated_at"),
+            last_modified=False, representation=fmt
+        )
+        cached = conditional.not_modified(request, validators, response)
+        if cached is not None:
+            return cached
+        if fmt != negotiation.JSON:
+            return compact_response(fmt, members, MemberResponse, validators.headers)
+        return members
+
+    filters = dict(skip=skip, limit=limit, active=active, name=name)
+    validators = conditional.Validators(
+        await member_crud.get_members_version(db, **filters),
+        last_modified=False, representation=fmt
     )
+    cached = conditional.not_modified(request, validators, response)
+    if cached is not None:
+        return cached
+    members = await member_crud.get_members(db, **filters)
+    if fmt != negotiation.JSON:
+        return compact_response(fmt, members, MemberResponse, validators.headers)
     return members
 
 
+@router.get("/page", response_model=Page[MemberResponse])
+async def read_members_page(
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    active: Optional[bool] = None,
+    name: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Cursor-paginated listing; pass `next_cursor` back as `cursor` for the next page.
+    """
+    filters = dict(
+        limit=limit + 1, after_id=decode_cursor(cursor) or 0,
+        active=active, name=name
+    )
+    fmt = negotiation.list_format(request)
+    validators = conditional.Validators(
+        await member_crud.get_members_version(db, **filters),
+        last_modified=False, representation=fmt
+    )
+    cached = conditional.not_modified(request, validators, response)
+    if cached is not None:
+        return cached
+    page = page_of(await member_crud.get_members(db, **filters), limit)
+    if fmt != negotiation.JSON:
+        return compact_response(fmt, page.pop("items"), MemberResponse, validators.headers, **page)
+    return page
+
+
+@router.get("/export")
+async def export_members(
+    request: Request,
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+):
+    """
+    Stream every member as NDJSON or CSV in constant memory.
+    """
+    return export_response(
+        member_crud.stream_members,
+        [column.name for column in Member.__table__.columns],
+        format,
+        "members",
+        sessions=read_sessions(request),
+    )
+
+
+@router.get("/search", response_model=List[MemberResponse])
+async def search_members(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Search members by name, most relevant first.
+    """
+    return await search_crud.search_members(db, q=q, limit=limit)
+
+
+@router.get("/summary", response_model=List[MemberSummary])
+async def read_member_summaries(
+    ids: Optional[List[int]] = Depends(batch_ids),
+    current_date: Optional[date] = None,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Loan summaries of many members (`ids=1,2,3`) in one query, in the order given.
+    """
+    if ids is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="ids is required"
+        )
+    return await member_crud.get_member_summaries(db, ids, current_date=current_date)
+
+
+@router.get("/{member_id}/summary", response_model=MemberSummary)
+async def read_member_summary(
+    member_id: int,
+    current_date: Optional[date] = None,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Active, overdue and total loan counts plus the current loans, in one query.
+    """
+    summaries = await member_crud.get_member_summaries(db, [member_id], current_date=current_date)
+    if not summaries:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Member not found"
+        )
+    return summaries[0]
+
+
 @router.get("/{member_id}", response_model=MemberResponse)
-def read_member(
+async def read_member(
     member_id: int,
-    db: Session = Depends(get_db)
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_read_db)
 ):
-    db_member = member_crud.get_member(db, member_id=member_id)
+    db_member = await member_crud.get_member(db, member_id=member_id)
     if db_member is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Member not found"
         )
+    validators = conditional.Validators(versions.entity_version(db_member, "updated_at"))
+    cached = conditional.not_modified(request, validators, response)
+    if cached is not None:
+        return cached
     return db_member
 
 
 @router.put("/{member_id}", response_model=MemberResponse)
-def update_member(
+async def update_member(
     member_id: int,
     member: MemberUpdate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    db_member = member_crud.get_member(db, member_id=member_id)
+    db_member = await member_crud.get_member(db, member_id=member_id)
     if db_member is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -72,25 +211,25 @@ def update_member(
     
     # If email is being updated, check it doesn't conflict
     if member.email and member.email != db_member.email:
-        existing_member = member_crud.get_member_by_email(db, email=member.email)
+        existing_member = await member_crud.get_member_by_email(db, email=member.email)
         if existing_member:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"Member with email {member.email} already exists"
             )
     
-    return member_crud.update_member(db=db, member_id=member_id, member=member)
+    return await member_crud.update_member(db=db, member_id=member_id, member=member)
 
 
 @router.delete("/{member_id}", response_model=MemberResponse)
-def delete_member(
+async def delete_member(
     member_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    db_member = member_crud.get_member(db, member_id=member_id)
+    db_member = await member_crud.get_member(db, member_id=member_id)
     if db_member is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Member not found"
         )
-    return member_crud.delete_member(db=db, member_id=member_id)
\ No newline at end of file
+    return await member_crud.delete_member(db=db, member_id=member_id)
\ No newline at end of file
@@ -0,0 +1,27 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database.db import get_db, get_read_db
+from app.schemas.stats import LibraryStats
+from app.crud import stats as stats_crud
+
+router = APIRouter(
+    prefix="/stats",
+    tags=["stats"],
+)
+
+
+@router.get("/", response_model=LibraryStats)
+async def read_stats(db: AsyncSession = Depends(get_read_db)):
+    """
+    Library totals for dashboards. Served from counters maintained on every
+    write, so the cost does not grow with the number of books or loans.
+    """
+    return await stats_crud.get_stats(db)
+
+
+@router.post("/reconcile", response_model=LibraryStats)
+async def reconcile_stats(db: AsyncSession = Depends(get_db)):
+    """
+    Recount every statistic now instead of waiting for the periodic job.
+    """
+    return await stats_crud.reconcile(db)
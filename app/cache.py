@@ -0,0 +1,140 @@
+# Bounded in-process cache with a pluggable backend interface
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from app.config import settings
+
+
+class CacheBackend:
+    """Interface every cache backend implements.
+
+    Values must be plain data (dicts, ints, strings) so that backends
+    living outside the process can serialise them.
+    """
+
+    def get(self, key: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        raise NotImplementedError
+
+    def delete(self, *keys: str) -> None:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+    def prune(self) -> int:
+        """Drop expired entries and return how many were removed (backends
+        that expire entries on their own have nothing to do)"""
+        return 0
+
+    def stats(self) -> dict:
+        raise NotImplementedError
+
+
+class LocalCache(CacheBackend):
+    """LRU cache with per-entry expiry, safe to share between threads"""
+
+    def __init__(self, max_entries: int = 10000, ttl: float = 30.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, *keys: str) -> None:
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def prune(self) -> int:
+        """Drop expired entries; returns how many were removed"""
+        now = time.monotonic()
+        with self._lock:
+            expired = [key for key, (_, expires_at) in self._data.items() if expires_at < now]
+            for key in expired:
+                del self._data[key]
+        return len(expired)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "backend": "local",
+                "entries": len(self._data),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+            }
+
+
+class NullCache(CacheBackend):
+    """Backend used when caching is disabled"""
+
+    def get(self, key: str) -> Optional[Any]:
+        return None
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        pass
+
+    def delete(self, *keys: str) -> None:
+        pass
+
+    def clear(self) -> None:
+        pass
+
+    def stats(self) -> dict:
+        return {"backend": "disabled"}
+
+
+_backend: CacheBackend = (
+    LocalCache(settings.CACHE_MAX_ENTRIES, settings.CACHE_TTL_SECONDS)
+    if settings.CACHE_ENABLED
+    else NullCache()
+)
+
+
+def get_cache() -> CacheBackend:
+    return _backend
+
+
+def set_cache_backend(backend: CacheBackend) -> None:
+    """Swap in another backend (e.g. a shared one for multi-worker deployments)"""
+    global _backend
+    _backend = backend
@@ -1,16 +1,105 @@
 # For settings 
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Dict, Optional, Tuple
 
 
 class Settings(BaseSettings):
     DATABASE_URL: str
     API_PREFIX: str = "/api/v1"
     PROJECT_NAME: str = "Library Management System"
+
+    # Database engine / connection pool
+    DB_ECHO: bool = False
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_PRE_PING: bool = True
+    DB_POOL_RECYCLE: int = 1800
+
+    # Read replicas for the read-only routes: comma-separated URLs of
+    # databases replicated from DATABASE_URL. After a write, that client
+    # reads from the primary for READ_YOUR_WRITES_SECONDS.
+    DATABASE_REPLICA_URLS: str = ""
+    READ_YOUR_WRITES_SECONDS: float = 5.0
+
+    # Startup warm-up (the schema is migrated separately: alembic upgrade head)
+    DB_POOL_WARMUP: int = 2
+    WARMUP_PRIME_CACHES: bool = True
+
+    # Slow-query log (replaces echoing every statement)
+    SLOW_QUERY_LOG_ENABLED: bool = True
+    SLOW_QUERY_THRESHOLD_MS: float = 200.0
+    SLOW_QUERY_BUFFER_SIZE: int = 100
+    # Bound values (emails, names) end up in the log and the unauthenticated
+    # /admin/slow-queries; only turn this on where both are private
+    SLOW_QUERY_LOG_PARAMETERS: bool = False
+    SLOW_QUERY_EXPLAIN_SAMPLE_RATE: float = 0.0
+    SLOW_QUERY_EXPLAIN_ANALYZE: bool = False
+
+    # Entity cache for book/member lookups
+    CACHE_ENABLED: bool = True
+    CACHE_MAX_ENTRIES: int = 10000
+    CACHE_TTL_SECONDS: float = 30.0
+
+    # In-process search index used on non-PostgreSQL backends: rebuilt this
+    # often so each worker sees the others' writes (0: never)
+    SEARCH_INDEX_TTL_SECONDS: float = 300.0
+
+    # Production server (python -m app.serve)
+    SERVER_HOST: str = "0.0.0.0"
+    SERVER_PORT: int = 8000
+    SERVER_WORKERS: int = 0  # 0: one per CPU
+    SERVER_MAX_REQUESTS: int = 10000  # recycle a worker after this many; 0: never
+    SERVER_MAX_REQUESTS_JITTER: int = 1000
+    SERVER_GRACEFUL_TIMEOUT: float = 30.0
+    SERVER_KEEP_ALIVE: int = 5
+    SERVER_FORWARDED_ALLOW_IPS: str = "127.0.0.1"
+
+    # Background jobs (app/jobs.py); an interval of 0 disables a job
+    SCHEDULER_ENABLED: bool = True
+    SCHEDULER_JITTER: float = 0.1
+    OVERDUE_SWEEP_SECONDS: float = 600.0
+    OVERDUE_SWEEP_BATCH_SIZE: int = 500
+    OVERDUE_SWEEP_MAX_BATCHES: int = 20
+    STATS_RECONCILE_SECONDS: float = 300.0
+    CACHE_PRUNE_SECONDS: float = 60.0
+
+    # Admission control (app/admission.py), per worker: route class ->
+    # (concurrent requests, queued requests). The concurrent counts add up
+    # to 13, within DB_POOL_SIZE + DB_MAX_OVERFLOW (15) with two connections
+    # to spare for the background jobs; startup warns if they do not fit.
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_LIMITS: Dict[str, Tuple[int, int]] = {
+        "lookup": (5, 40),
+        "list": (3, 12),
+        "expensive": (1, 4),
+        "export": (1, 4),
+        "write": (3, 12),
+    }
+    ADMISSION_QUEUE_TIMEOUT: float = 5.0
+    ADMISSION_RETRY_AFTER: int = 2
+
+    # Idempotency-Key on the create POSTs (app/idempotency.py): first
+    # responses are replayed for IDEMPOTENCY_TTL_SECONDS; a claim whose
+    # request never finished is given up after IDEMPOTENCY_LOCK_SECONDS
+    IDEMPOTENCY_ENABLED: bool = True
+    IDEMPOTENCY_TTL_SECONDS: float = 86400.0
+    IDEMPOTENCY_LOCK_SECONDS: float = 60.0
+    IDEMPOTENCY_PRUNE_SECONDS: float = 3600.0
+
+    # Response compression (app/api/compression.py): zstd if the zstandard
+    # package is installed and the client accepts it, else gzip
+    COMPRESSION_ENABLED: bool = True
+    COMPRESSION_MINIMUM_SIZE: int = 1024
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_ZSTD_LEVEL: int = 3
+
+    # Prometheus-format /metrics and per-request instrumentation
+    METRICS_ENABLED: bool = True
     
     class Config:
         env_file = ".env"
         case_sensitive = True
 
 
-settings = Settings()
\ No newline at end of file
+settings = Settings()
@@ -1,34 +1,73 @@
-# The crud will be changed .It will be asynchronous  in furture
+# Async crud operations for books
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, delete
+from sqlalchemy import select, insert, update, delete
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import selectinload
 from typing import Optional, List
 from app.models.models import Book
+from app.crud import cache, search, stats, versions
 from app.schemas.book import BookCreate, BookUpdate
 
 
-def get_book(db: AsyncSession, book_id: int):
-    """Get a book by ID"""
-    result = db.execute(select(Book).where(Book.id == book_id))
-    return result.scalars().first()
+async def get_book(db: AsyncSession, book_id: int):
+    """Get a book by ID (served from the entity cache when possible)"""
+    db_book = cache.get_entity(Book, book_id)
+    if db_book is not None:
+        return db_book
+    result = await db.execute(
+        select(Book)
+        .where(Book.id == book_id)
+        .execution_options(populate_existing=True)
+    )
+    db_book = result.scalars().first()
+    cache.store_entity(db_book)
+    return db_book
+
 
+async def get_books_by_ids(db: AsyncSession, book_ids: List[int]):
+    """
+    Get books by ID in the order given, skipping unknown ids. Ids missing
+    from the entity cache are fetched with a single IN query.
+    """
+    book_ids = list(dict.fromkeys(book_ids))
+    found, missing = cache.get_entities(Book, book_ids)
+    if missing:
+        result = await db.execute(
+            select(Book)
+            .where(Book.id.in_(missing))
+            .execution_options(populate_existing=True)
+        )
+        for db_book in result.scalars():
+            cache.store_entity(db_book)
+            found[db_book.id] = db_book
+    return [found[book_id] for book_id in book_ids if book_id in found]
 
-def get_book_by_isbn(db: AsyncSession, isbn: str):
+
+async def get_book_by_isbn(db: AsyncSession, isbn: str):
     """Get a book by ISBN"""
-    result = db.execute(select(Book).where(Book.isbn == isbn))
-    return result.scalars().first()
+    book_id = cache.get_lookup(Book, "isbn", isbn)
+    if book_id is not None:
+        db_book = await get_book(db, book_id)
+        if db_book is not None and db_book.isbn == isbn:
+            return db_book
+        cache.forget_lookup(Book, "isbn", isbn)
+    result = await db.execute(select(Book).where(Book.isbn == isbn))
+    db_book = result.scalars().first()
+    if db_book is not None:
+        cache.store_entity(db_book)
+        cache.store_lookup(Book, "isbn", isbn, db_book.id)
+    return db_book
 
 
-def get_books(
-    db: AsyncSession,
+def _books_query(
     skip: int = 0,
     limit: int = 100,
+    after_id: Optional[int] = None,
     title: Optional[str] = None,
     author: Optional[str] = None,
     available: Optional[bool] = None,
 ):
-    """Get all books with optional filtering"""
     query = select(Book)
     
     # Apply filters if provided
@@ -39,40 +78,144 @@ def get_books(
     if available is not None:
         query = query.filter(Book.available == available)
 
-    query = query.offset(skip).limit(limit)
-    result = db.execute(query)
+    # Keyset pagination: seek past the last id instead of scanning `skip` rows
+    if after_id is not None:
+        return query.filter(Book.id > after_id).order_by(Book.id).limit(limit)
+    return query.order_by(Book.id).offset(skip).limit(limit)
+
+
+async def get_books(
+    db: AsyncSession,
+    skip: int = 0,
+    limit: int = 100,
+    after_id: Optional[int] = None,
+    title: Optional[str] = None,
+    author: Optional[str] = None,
+    available: Optional[bool] = None,
+):
+    """Get all books with optional filtering"""
+    result = await db.execute(
+        _books_query(skip, limit, after_id, title, author, available)
+    )
     return result.scalars().all()
 
 
-def create_book(db: AsyncSession, book: BookCreate):
+async def get_books_version(db: AsyncSession, **filters) -> versions.Version:
+    """Change detector for the books get_books(db, **filters) would return"""
+    return await versions.query_version(
+        db, _books_query(**filters), Book.id, Book.created_at, Book.updated_at,
+        revisions=(Book.revision,),
+    )
+
+
+async def create_book(db: AsyncSession, book: BookCreate):
     """Create a new book"""
     db_book = Book(**book.model_dump())
     db.add(db_book)
-    db.commit()
-    db.refresh(db_book)
+    await stats.adjust(db, total_books=1, available_books=int(book.available))
+    await db.commit()
+    await db.refresh(db_book)
+    search.index_book(db_book)
     return db_book
 
 
-def update_book(db: AsyncSession, book_id: int, book: BookUpdate):
+async def create_books_bulk(db: AsyncSession, books: List[BookCreate]) -> List[Optional[int]]:
+    """
+    Insert many books in one transaction, skipping ISBNs that already exist.
+    Returns the new id for each book, or None where its ISBN was a duplicate
+    (of an existing book or of an earlier book in the same batch).
+    """
+    for attempt in range(2):
+        # One set-based query finds every ISBN in the batch that is taken
+        result = await db.execute(
+            select(Book.isbn).where(Book.isbn.in_({book.isbn for book in books}))
+        )
+        taken = set(result.scalars().all())
+        positions, rows = [], []
+        for position, book in enumerate(books):
+            if book.isbn in taken:
+                continue
+            taken.add(book.isbn)
+            positions.append(position)
+            rows.append(book.model_dump())
+
+        ids: List[Optional[int]] = [None] * len(books)
+        if not rows:
+            return ids
+        try:
+            result = await db.execute(
+                insert(Book).returning(Book.id, sort_by_parameter_order=True),
+                rows,
+            )
+            new_ids = result.scalars().all()
+            await stats.adjust(
+                db,
+                total_books=len(rows),
+                available_books=sum(1 for row in rows if row["available"]),
+            )
+            await db.commit()
+        except IntegrityError:
+            # A concurrent writer took one of the ISBNs; re-check once
+            await db.rollback()
+            if attempt:
+                raise
+            continue
+
+        for position, row, book_id in zip(positions, rows, new_ids):
+            ids[position] = book_id
+            search.index_book(Book(id=book_id, **row))
+        return ids
+
+
+async def update_book(db: AsyncSession, book_id: int, book: BookUpdate):
     """Update a book"""
     # Filter out None values
     update_data = {k: v for k, v in book.model_dump().items() if v is not None}
     if not update_data:
-        return  get_book(db, book_id)
+        return await get_book(db, book_id)
     
-    db.execute(
-        update(Book)
-        .where(Book.id == book_id)
-        .values(**update_data)
-    )
-    db.commit()
-    return  get_book(db, book_id)
+    statement = update(Book).where(Book.id == book_id).values(**update_data)
+    available = update_data.get("available")
+    if available is None:
+        await db.execute(statement)
+    else:
+        # Only an update that changes availability moves the counter
+        was_available = Book.available.is_(True)
+        changed = await db.execute(
+            statement.where(~was_available if available else was_available).returning(Book.id)
+        )
+        if changed.scalar() is not None:
+            await stats.adjust(db, available_books=1 if available else -1)
+        else:
+            await db.execute(statement)
+    await db.commit()
+    cache.invalidate_entity(Book, book_id)
+    db_book = await get_book(db, book_id)
+    search.index_book(db_book)
+    return db_book
 
 
-def delete_book(db: AsyncSession, book_id: int):
+async def delete_book(db: AsyncSession, book_id: int):
     """Delete a book"""
-    book =  get_book(db, book_id)
+    book = await get_book(db, book_id)
     if book:
-         db.execute(delete(Book).where(Book.id == book_id))
-         db.commit()
-    return book
\ No newline at end of file
+        deleted = await db.execute(
+            delete(Book).where(Book.id == book_id).returning(Book.available)
+        )
+        for available in deleted.scalars():
+            await stats.adjust(db, total_books=-1, available_books=-int(available is True))
+        await db.commit()
+        cache.invalidate_entity(Book, book_id)
+        search.unindex_book(book_id)
+    return book
+
+
+async def stream_books(db: AsyncSession, batch_size: int = 1000):
+    """Yield all books in id order, in batches, from a server-side cursor"""
+    result = await db.stream(
+        select(*Book.__table__.columns)
+        .order_by(Book.id)
+        .execution_options(yield_per=batch_size)
+    )
+    async for rows in result.mappings().partitions():
+        yield rows
@@ -0,0 +1,67 @@
+# Read-through caching of single-entity lookups.
+#
+# Entities are cached as column snapshots under "<table>:<id>"; unique
+# lookups (ISBN, email) only map to the id, so invalidating the id entry
+# is enough to keep both paths correct.
+
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import inspect
+
+from app.cache import get_cache
+from app.database.db import is_replica_session
+
+
+def _entity_key(model, entity_id) -> str:
+    return f"{model.__tablename__}:{entity_id}"
+
+
+def _lookup_key(model, field: str, value) -> str:
+    return f"{model.__tablename__}:{field}:{value}"
+
+
+def snapshot(obj) -> dict:
+    return {attr.key: getattr(obj, attr.key) for attr in inspect(obj).mapper.column_attrs}
+
+
+def get_entity(model, entity_id):
+    """Cached instance of ``model`` (detached, not attached to any session), or None"""
+    data = get_cache().get(_entity_key(model, entity_id))
+    if data is None:
+        return None
+    return model(**data)
+
+
+def get_entities(model, entity_ids: Iterable[int]) -> Tuple[Dict[int, object], List[int]]:
+    """Cached instances of ``model`` by id, and the ids that were not cached"""
+    found, missing = {}, []
+    for entity_id in entity_ids:
+        entity = get_entity(model, entity_id)
+        if entity is None:
+            missing.append(entity_id)
+        else:
+            found[entity_id] = entity
+    return found, missing
+
+
+def store_entity(obj) -> None:
+    # A lagging replica could put back an entry a write just invalidated
+    if obj is not None and not is_replica_session(inspect(obj).session):
+        get_cache().set(_entity_key(type(obj), obj.id), snapshot(obj))
+
+
+def invalidate_entity(model, entity_id) -> None:
+    get_cache().delete(_entity_key(model, entity_id))
+
+
+def get_lookup(model, field: str, value) -> Optional[int]:
+    """Id previously found for ``model.field == value``"""
+    return get_cache().get(_lookup_key(model, field, value))
+
+
+def store_lookup(model, field: str, value, entity_id: int) -> None:
+    get_cache().set(_lookup_key(model, field, value), entity_id)
+
+
+def forget_lookup(model, field: str, value) -> None:
+    get_cache().delete(_lookup_key(model, field, value))
@@ -0,0 +1,83 @@
+# Stored first responses for Idempotency-Key requests. A request claims its
+# key before it runs; the claim becomes the stored response when it is done,
+# or is released (or simply expires) if it fails.
+
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.models import IdempotencyKey
+
+
+def _key(path: str, key: str):
+    return (IdempotencyKey.path == path) & (IdempotencyKey.key == key)
+
+
+async def claim(
+    db: AsyncSession, path: str, key: str, fingerprint: str, lock_seconds: float
+) -> Optional[IdempotencyKey]:
+    """
+    Claim ``key`` for a request to ``path``. None if the caller now holds
+    it; otherwise the current record (stored, or another request's claim).
+    """
+    now = datetime.now(timezone.utc)
+    values = dict(
+        fingerprint=fingerprint, status_code=None, content_type=None, body=None,
+        expires_at=now + timedelta(seconds=lock_seconds),
+    )
+    while True:
+        # An expired response, or a claim whose request died, is free to take
+        taken = await db.execute(
+            update(IdempotencyKey)
+            .where(_key(path, key), IdempotencyKey.expires_at < now)
+            .values(**values)
+        )
+        if taken.rowcount:
+            await db.commit()
+            return None
+        try:
+            await db.execute(insert(IdempotencyKey).values(path=path, key=key, **values))
+            await db.commit()
+            return None
+        except IntegrityError:
+            await db.rollback()
+        record = await db.scalar(select(IdempotencyKey).where(_key(path, key)))
+        if record is not None:
+            return record
+        # The other request released its claim in between: claim again
+
+
+async def store(
+    db: AsyncSession, path: str, key: str, status_code: int, content_type: Optional[str],
+    body: bytes, ttl: float,
+) -> None:
+    """Turn a claim into the response replayed for ``ttl`` seconds"""
+    await db.execute(
+        update(IdempotencyKey)
+        .where(_key(path, key))
+        .values(
+            status_code=status_code, content_type=content_type, body=body,
+            expires_at=datetime.now(timezone.utc) + timedelta(seconds=ttl),
+        )
+    )
+    await db.commit()
+
+
+async def release(db: AsyncSession, path: str, key: str) -> None:
+    """Drop an unfinished claim, so that a retry runs the request again"""
+    await db.execute(
+        delete(IdempotencyKey).where(_key(path, key), IdempotencyKey.status_code.is_(None))
+    )
+    await db.commit()
+
+
+async def prune(db: AsyncSession) -> int:
+    """Delete expired records; returns how many"""
+    result = await db.execute(
+        delete(IdempotencyKey).where(IdempotencyKey.expires_at < datetime.now(timezone.utc))
+    )
+    await db.commit()
+    return result.rowcount
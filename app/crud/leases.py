@@ -0,0 +1,46 @@
+# Leases on named scheduled jobs, so that only one worker (the leader)
+# runs a job at a time. A lease held by a crashed worker simply expires.
+
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import insert, or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.models import JobLease
+
+
+async def acquire(db: AsyncSession, name: str, holder: str, ttl: float) -> bool:
+    """
+    Take or renew the lease on ``name`` for ``ttl`` seconds. True if
+    ``holder`` now holds it; False if another holder's lease is still valid.
+    """
+    now = datetime.now(timezone.utc)
+    expires_at = now + timedelta(seconds=ttl)
+    # One conditional UPDATE: the row lock decides between racing workers
+    renewed = await db.execute(
+        update(JobLease)
+        .where(JobLease.name == name, or_(JobLease.holder == holder, JobLease.expires_at < now))
+        .values(holder=holder, expires_at=expires_at)
+    )
+    if renewed.rowcount:
+        await db.commit()
+        return True
+    try:
+        await db.execute(insert(JobLease).values(name=name, holder=holder, expires_at=expires_at))
+        await db.commit()
+    except IntegrityError:
+        # The lease exists and is held by someone else
+        await db.rollback()
+        return False
+    return True
+
+
+async def release(db: AsyncSession, name: str, holder: str) -> None:
+    """Expire ``holder``'s lease on ``name`` now, so another worker can take over"""
+    await db.execute(
+        update(JobLease)
+        .where(JobLease.name == name, JobLease.holder == holder)
+        .values(expires_at=datetime.now(timezone.utc))
+    )
+    await db.commit()
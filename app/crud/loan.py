@@ -1,34 +1,64 @@
-# The crud will be changed .It will be asynchronous  in furture
+# Async crud operations for loans
 
-from sqlalchemy import select, update, delete, and_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import (
+    Date, select, insert, update, delete, and_, case, func, literal, tuple_,
+)
 from sqlalchemy.orm import joinedload
-from typing import Optional, List
-from datetime import date
+from typing import Optional, List, Tuple
+from datetime import date, datetime, timedelta
 from app.models.models import Loan, Book, Member
-from app.schemas.loan import LoanCreate, LoanUpdate
+from app.schemas.loan import LoanBatchCreate, LoanCreate, LoanUpdate
+from app.crud import cache, stats, versions
 
+# Loan period used when a checkout does not give a due date
+LOAN_PERIOD = timedelta(days=14)
 
 
-def get_loan(db, loan_id: int):
+async def get_loan(db: AsyncSession, loan_id: int):
     """Get a loan by ID"""
-    result = db.execute(
+    result = await db.execute(
         select(Loan)
         .options(joinedload(Loan.book), joinedload(Loan.member))
         .where(Loan.id == loan_id)
+        .execution_options(populate_existing=True)
     )
     return result.scalars().first()
 
 
-def get_loans(
-    db,
+def _loan_details():
+    """
+    Exactly the LoanDetailResponse columns: the loan row plus book title
+    and member name, joined in SQL instead of loading both relationships.
+    """
+    return (
+        select(
+            *Loan.__table__.columns,
+            func.coalesce(Book.title, "Unknown Book").label("book_title"),
+            func.coalesce(
+                Member.first_name + " " + Member.last_name, "Unknown Member"
+            ).label("member_name"),
+        )
+        .outerjoin(Book, Book.id == Loan.book_id)
+        .outerjoin(Member, Member.id == Loan.member_id)
+    )
+
+
+async def get_loan_detail(db: AsyncSession, loan_id: int):
+    """Get a loan's detail row by ID"""
+    result = await db.execute(_loan_details().where(Loan.id == loan_id))
+    return result.first()
+
+
+def _loans_query(
     skip: int = 0,
     limit: int = 100,
+    after_id: Optional[int] = None,
     member_id: Optional[int] = None,
     book_id: Optional[int] = None,
     is_returned: Optional[bool] = None,
 ):
-    """Get all loans with optional filtering"""
-    query = select(Loan).options(joinedload(Loan.book), joinedload(Loan.member))
+    query = _loan_details()
     
     # Apply filters if provided
     if member_id:
@@ -41,87 +71,354 @@ def get_loans(
         else:
             query = query.filter(Loan.return_date.is_(None))
 
-    query = query.offset(skip).limit(limit)
-    result = db.execute(query)
-    return result.scalars().all()
+    # Keyset pagination: seek past the last id instead of scanning `skip` rows
+    if after_id is not None:
+        return query.filter(Loan.id > after_id).order_by(Loan.id).limit(limit)
+    return query.order_by(Loan.id).offset(skip).limit(limit)
 
 
-def create_loan(db, loan: LoanCreate):
-    """Create a new loan and update book availability"""
-    # Create loan record
-    db_loan = Loan(**loan.model_dump())
-    
-    # Update book availability
-    db.execute(
+async def get_loans(
+    db: AsyncSession,
+    skip: int = 0,
+    limit: int = 100,
+    after_id: Optional[int] = None,
+    member_id: Optional[int] = None,
+    book_id: Optional[int] = None,
+    is_returned: Optional[bool] = None,
+):
+    """Get loan detail rows with optional filtering"""
+    result = await db.execute(
+        _loans_query(skip, limit, after_id, member_id, book_id, is_returned)
+    )
+    return result.all()
+
+
+# A loan detail row also shows its book's title and member's name
+DETAIL_TIMESTAMPS = (Loan.created_at, Loan.updated_at, Book.updated_at, Member.updated_at)
+DETAIL_REVISIONS = (Loan.revision, Book.revision, Member.revision)
+
+
+async def get_loans_version(db: AsyncSession, **filters) -> versions.Version:
+    """Change detector for the rows get_loans(db, **filters) would return"""
+    return await versions.query_version(
+        db, _loans_query(**filters), Loan.id, *DETAIL_TIMESTAMPS, revisions=DETAIL_REVISIONS
+    )
+
+
+async def get_loan_version(db: AsyncSession, loan_id: int) -> versions.Version:
+    """Change detector for a loan's detail row; ``rows`` is 0 if it does not exist"""
+    return await versions.query_version(
+        db, _loan_details().where(Loan.id == loan_id), Loan.id, *DETAIL_TIMESTAMPS,
+        revisions=DETAIL_REVISIONS,
+    )
+
+
+class CheckoutError(Exception):
+    """A loan could not be created; ``not_found`` separates 404s from 400s"""
+
+    def __init__(self, detail: str, not_found: bool = False):
+        super().__init__(detail)
+        self.detail = detail
+        self.not_found = not_found
+
+
+def _books_phrase(book_ids: List[int]) -> str:
+    if len(book_ids) == 1:
+        return f"Book with ID {book_ids[0]}"
+    return "Books with IDs " + ", ".join(str(book_id) for book_id in book_ids)
+
+
+async def create_loans(db: AsyncSession, batch: LoanBatchCreate) -> List[dict]:
+    """
+    Check several books out to one member atomically, all or nothing:
+    claim every book with one conditional UPDATE ... WHERE id IN (...)
+    RETURNING, then insert all loans with one INSERT ... SELECT that only
+    yields rows if the member is active. Concurrent checkouts of the same
+    book cannot both succeed. Raises CheckoutError after rolling back.
+    Returns the loans in the order of ``batch.book_ids``.
+    """
+    book_ids = list(dict.fromkeys(batch.book_ids))
+    due_date = batch.due_date or (datetime.utcnow() + LOAN_PERIOD).date()
+
+    claimed = await db.execute(
         update(Book)
-        .where(Book.id == loan.book_id)
+        .where(Book.id.in_(book_ids), Book.available.is_(True))
         .values(available=False)
+        .returning(Book.id)
+    )
+    claimed_ids = set(claimed.scalars().all())
+    if len(claimed_ids) < len(book_ids):
+        await db.rollback()
+        existing = set(
+            (await db.execute(select(Book.id).where(Book.id.in_(book_ids)))).scalars().all()
+        )
+        missing = [book_id for book_id in book_ids if book_id not in existing]
+        if missing:
+            raise CheckoutError(f"{_books_phrase(missing)} not found", not_found=True)
+        unavailable = [book_id for book_id in book_ids if book_id not in claimed_ids]
+        verb = "is" if len(unavailable) == 1 else "are"
+        raise CheckoutError(f"{_books_phrase(unavailable)} {verb} not available for loan")
+
+    # INSERT ... SELECT joined to the member so an inactive or missing member inserts nothing
+    loans = Loan.__table__
+    created = await db.execute(
+        insert(loans)
+        .from_select(
+            ["book_id", "member_id", "loan_date", "due_date"],
+            select(
+                Book.id,
+                Member.id,
+                literal(batch.loan_date, Date),
+                literal(due_date, Date),
+            )
+            .select_from(Book)
+            .join(Member, and_(Member.id == batch.member_id, Member.active.is_(True)))
+            .where(Book.id.in_(book_ids)),
+        )
+        .returning(*loans.columns)
+    )
+    db_loans = {row["book_id"]: dict(row) for row in created.mappings().all()}
+    if not db_loans:
+        await db.rollback()
+        if await db.scalar(select(Member.id).where(Member.id == batch.member_id)) is None:
+            raise CheckoutError(f"Member with ID {batch.member_id} not found", not_found=True)
+        raise CheckoutError(f"Member with ID {batch.member_id} is not active")
+
+    await stats.adjust(
+        db,
+        due_date=due_date,
+        active_loans=len(db_loans),
+        available_books=-len(db_loans),
+        overdue_loans=len(db_loans),
+    )
+    await db.commit()
+    for book_id in book_ids:
+        cache.invalidate_entity(Book, book_id)
+    return [db_loans[book_id] for book_id in book_ids]
+
+
+async def create_loan(db: AsyncSession, loan: LoanCreate):
+    """Check a single book out (see create_loans)"""
+    batch = LoanBatchCreate(
+        member_id=loan.member_id,
+        book_ids=[loan.book_id],
+        loan_date=loan.loan_date,
+        due_date=loan.due_date,
+    )
+    return (await create_loans(db, batch))[0]
+
+
+async def _free_book(db: AsyncSession, book_id: int, due_date: date) -> None:
+    """Make the book of a loan being closed available again, and count it"""
+    freed = await db.execute(
+        update(Book)
+        .where(Book.id == book_id, Book.available.isnot(True))
+        .values(available=True)
+        .returning(Book.id)
+    )
+    await stats.adjust(
+        db,
+        due_date=due_date,
+        active_loans=-1,
+        available_books=int(freed.scalar() is not None),
+        overdue_loans=-1,
     )
-    
-    db.add(db_loan)
-    db.commit()
-    db.refresh(db_loan)
-    return db_loan
 
 
-def update_loan(db, loan_id: int, loan_update: LoanUpdate):
-    """Update a loan and handle book return if applicable"""
+async def update_loan(db: AsyncSession, loan_id: int, loan_update: LoanUpdate):
+    """
+    Update a loan. Returning a book closes the loan with a conditional
+    UPDATE ... RETURNING and frees the book in the same transaction.
+    Returns the loan's detail row, or None if the loan does not exist.
+    """
     update_data = {k: v for k, v in loan_update.model_dump().items() if v is not None}
-    
-    # If returning a book, update the book's availability
-    if "return_date" in update_data and update_data["return_date"] is not None:
-        loan = get_loan(db, loan_id)
-        if loan:
-            db.execute(
-                update(Book)
-                .where(Book.id == loan.book_id)
-                .values(available=True)
-            )
-    
-    if update_data:
-        db.execute(
+    if not update_data:
+        return await get_loan_detail(db, loan_id)
+
+    book_id = None
+    if "return_date" in update_data:
+        # Only the first return of an open loan frees the book
+        closed = await db.execute(
+            update(Loan)
+            .where(Loan.id == loan_id, Loan.return_date.is_(None))
+            .values(**update_data)
+            .returning(Loan.book_id, Loan.due_date)
+        )
+        book_id, due_date = closed.first() or (None, None)
+
+    if book_id is not None:
+        await _free_book(db, book_id, due_date)
+    else:
+        updated = await db.execute(
             update(Loan)
             .where(Loan.id == loan_id)
             .values(**update_data)
+            .returning(Loan.id)
         )
-        db.commit()
-    
-    return get_loan(db, loan_id)
+        if updated.scalar() is None:
+            await db.rollback()
+            return None
 
+    await db.commit()
+    if book_id is not None:
+        cache.invalidate_entity(Book, book_id)
+    return await get_loan_detail(db, loan_id)
 
-def delete_loan(db, loan_id: int):
+
+async def delete_loan(db: AsyncSession, loan_id: int):
     """Delete a loan"""
-    loan = get_loan(db, loan_id)
+    loan = await get_loan(db, loan_id)
     if loan:
+        deleted = await db.execute(
+            delete(Loan).where(Loan.id == loan_id).returning(Loan.return_date)
+        )
+        row = deleted.first()
         # If the loan is for a book that's not returned yet, make it available again
-        if not loan.return_date:
-            db.execute(
-                update(Book)
-                .where(Book.id == loan.book_id)
-                .values(available=True)
-            )
-        
-        db.execute(delete(Loan).where(Loan.id == loan_id))
-        db.commit()
+        if row is not None and row.return_date is None:
+            await _free_book(db, loan.book_id, loan.due_date)
+        await db.commit()
+        cache.invalidate_entity(Book, loan.book_id)
     
     return loan
 
 
-def get_overdue_loans(db, current_date: date = None):
-    """Get all overdue loans"""
+def _overdue(current_date: date):
+    return and_(Loan.due_date < current_date, Loan.return_date.is_(None))
+
+
+async def mark_overdue_loans(db: AsyncSession, current_date: date, limit: int = 500) -> int:
+    """
+    Set marked_overdue_at on up to ``limit`` overdue loans not marked yet,
+    oldest due date first, and commit. Returns how many were marked; fewer
+    than ``limit`` means none are left.
+    """
+    batch = (
+        select(Loan.id)
+        .where(_overdue(current_date), Loan.marked_overdue_at.is_(None))
+        .order_by(Loan.due_date, Loan.id)
+        .limit(limit)
+    )
+    result = await db.execute(
+        update(Loan)
+        .where(Loan.id.in_(batch))
+        .values(marked_overdue_at=func.now())
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    return result.rowcount
+
+
+def _overdue_query(
+    current_date: date = None,
+    limit: Optional[int] = None,
+    after: Optional[Tuple[date, int]] = None,
+):
     if current_date is None:
         current_date = date.today()
     
     query = (
-        select(Loan)
-        .options(joinedload(Loan.book), joinedload(Loan.member))
-        .where(
-            and_(
-                Loan.due_date < current_date,
-                Loan.return_date.is_(None)
-            )
+        _loan_details()
+        .where(_overdue(current_date))
+        .order_by(Loan.due_date, Loan.id)
+    )
+    if after is not None:
+        query = query.where(tuple_(Loan.due_date, Loan.id) > tuple_(*after))
+    if limit is not None:
+        query = query.limit(limit)
+    return query
+
+
+async def get_overdue_loans(
+    db: AsyncSession,
+    current_date: date = None,
+    limit: Optional[int] = None,
+    after: Optional[Tuple[date, int]] = None,
+):
+    """
+    Get overdue loan detail rows, oldest due date first. ``after`` is the
+    (due_date, id) of the last loan on the previous page.
+    """
+    result = await db.execute(_overdue_query(current_date, limit, after))
+    return result.all()
+
+
+async def get_overdue_loans_version(db: AsyncSession, **filters) -> versions.Version:
+    """Change detector for the rows get_overdue_loans(db, **filters) would return"""
+    return await versions.query_version(
+        db, _overdue_query(**filters), Loan.id, *DETAIL_TIMESTAMPS, revisions=DETAIL_REVISIONS
+    )
+
+
+async def stream_overdue_loans(db: AsyncSession, current_date: date, batch_size: int = 1000):
+    """Yield overdue loans with book title and member name, in batches, from a server-side cursor"""
+    result = await db.stream(
+        select(
+            *Loan.__table__.columns,
+            Book.title.label("book_title"),
+            (Member.first_name + " " + Member.last_name).label("member_name"),
         )
+        .join(Book, Book.id == Loan.book_id)
+        .join(Member, Member.id == Loan.member_id)
+        .where(_overdue(current_date))
+        .order_by(Loan.due_date, Loan.id)
+        .execution_options(yield_per=batch_size)
     )
-    
-    result = db.execute(query)
-    return result.scalars().all()
+    async for rows in result.mappings().partitions():
+        yield rows
+
+
+# Upper bounds (inclusive, in days overdue) of the summary buckets
+OVERDUE_BUCKETS = (7, 14, 30, 60)
+
+
+async def count_overdue_loans(db: AsyncSession, current_date: date) -> int:
+    return await db.scalar(select(func.count()).select_from(Loan).where(_overdue(current_date)))
+
+
+async def overdue_counts_by_member(db: AsyncSession, current_date: date, limit: int = 100):
+    """Overdue loan counts per member, largest first, computed in the database"""
+    overdue_count = func.count(Loan.id).label("overdue_count")
+    result = await db.execute(
+        select(
+            Loan.member_id,
+            (Member.first_name + " " + Member.last_name).label("member_name"),
+            overdue_count,
+            func.min(Loan.due_date).label("oldest_due_date"),
+        )
+        .join(Member, Member.id == Loan.member_id)
+        .where(_overdue(current_date))
+        .group_by(Loan.member_id, Member.first_name, Member.last_name)
+        .order_by(overdue_count.desc(), Loan.member_id)
+        .limit(limit)
+    )
+    return result.mappings().all()
+
+
+async def overdue_counts_by_days(db: AsyncSession, current_date: date):
+    """Overdue loan counts per days-overdue bucket, computed in the database"""
+    # Buckets compare due_date with precomputed dates, so no
+    # dialect-specific date arithmetic is needed
+    whens, low = [], 1
+    for high in OVERDUE_BUCKETS:
+        whens.append((Loan.due_date >= current_date - timedelta(days=high), f"{low}-{high}"))
+        low = high + 1
+    bucket = case(*whens, else_=literal(f"{low}+")).label("days_overdue")
+    result = await db.execute(
+        select(bucket, func.count(Loan.id).label("overdue_count"))
+        .where(_overdue(current_date))
+        .group_by(bucket)
+    )
+    counts = {row.days_overdue: row.overdue_count for row in result}
+    labels = [label for _, label in whens] + [f"{low}+"]
+    return [{"days_overdue": label, "overdue_count": counts.get(label, 0)} for label in labels]
+
+
+async def stream_loans(db: AsyncSession, batch_size: int = 1000):
+    """Yield all loans in id order, in batches, from a server-side cursor"""
+    result = await db.stream(
+        select(*Loan.__table__.columns)
+        .order_by(Loan.id)
+        .execution_options(yield_per=batch_size)
+    )
+    async for rows in result.mappings().partitions():
+        yield rows
@@ -1,31 +1,71 @@
-# The crud will be changed .It will be asynchronous  in furture
+# Async crud operations for members
 
-from sqlalchemy import select, update, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update, delete, and_, case, func
 from typing import Optional, List
-from app.models.models import Member
-from app.schemas.member import MemberCreate, MemberUpdate
+from datetime import date
+from app.models.models import Book, Loan, Member
+from app.crud import cache, search, stats, versions
+from app.schemas.members import MemberCreate, MemberUpdate
 
 
-def get_member(db, member_id: int):
-    """Get a member by ID"""
-    result = db.execute(select(Member).where(Member.id == member_id))
-    return result.scalars().first()
+async def get_member(db: AsyncSession, member_id: int):
+    """Get a member by ID (served from the entity cache when possible)"""
+    db_member = cache.get_entity(Member, member_id)
+    if db_member is not None:
+        return db_member
+    result = await db.execute(
+        select(Member)
+        .where(Member.id == member_id)
+        .execution_options(populate_existing=True)
+    )
+    db_member = result.scalars().first()
+    cache.store_entity(db_member)
+    return db_member
 
 
-def get_member_by_email(db, email: str):
+async def get_members_by_ids(db: AsyncSession, member_ids: List[int]):
+    """
+    Get members by ID in the order given, skipping unknown ids. Ids missing
+    from the entity cache are fetched with a single IN query.
+    """
+    member_ids = list(dict.fromkeys(member_ids))
+    found, missing = cache.get_entities(Member, member_ids)
+    if missing:
+        result = await db.execute(
+            select(Member)
+            .where(Member.id.in_(missing))
+            .execution_options(populate_existing=True)
+        )
+        for db_member in result.scalars():
+            cache.store_entity(db_member)
+            found[db_member.id] = db_member
+    return [found[member_id] for member_id in member_ids if member_id in found]
+
+
+async def get_member_by_email(db: AsyncSession, email: str):
     """Get a member by email"""
-    result = db.execute(select(Member).where(Member.email == email))
-    return result.scalars().first()
+    member_id = cache.get_lookup(Member, "email", email)
+    if member_id is not None:
+        db_member = await get_member(db, member_id)
+        if db_member is not None and db_member.email == email:
+            return db_member
+        cache.forget_lookup(Member, "email", email)
+    result = await db.execute(select(Member).where(Member.email == email))
+    db_member = result.scalars().first()
+    if db_member is not None:
+        cache.store_entity(db_member)
+        cache.store_lookup(Member, "email", email, db_member.id)
+    return db_member
 
 
-def get_members(
-    db,
+def _members_query(
     skip: int = 0,
     limit: int = 100,
+    after_id: Optional[int] = None,
     active: Optional[bool] = None,
     name: Optional[str] = None
 ):
-    """Get all members with optional filtering"""
     query = select(Member)
     
     # Apply filters if provided
@@ -37,40 +77,161 @@ def get_members(
             (Member.last_name.ilike(f"%{name}%"))
         )
 
-    query = query.offset(skip).limit(limit)
-    result = db.execute(query)
+    # Keyset pagination: seek past the last id instead of scanning `skip` rows
+    if after_id is not None:
+        return query.filter(Member.id > after_id).order_by(Member.id).limit(limit)
+    return query.order_by(Member.id).offset(skip).limit(limit)
+
+
+async def get_members(
+    db: AsyncSession,
+    skip: int = 0,
+    limit: int = 100,
+    after_id: Optional[int] = None,
+    active: Optional[bool] = None,
+    name: Optional[str] = None
+):
+    """Get all members with optional filtering"""
+    result = await db.execute(_members_query(skip, limit, after_id, active, name))
     return result.scalars().all()
 
 
-def create_member(db, member: MemberCreate):
+async def get_members_version(db: AsyncSession, **filters) -> versions.Version:
+    """Change detector for the members get_members(db, **filters) would return"""
+    return await versions.query_version(
+        db, _members_query(**filters), Member.id, Member.updated_at, revisions=(Member.revision,)
+    )
+
+
+async def get_member_summaries(
+    db: AsyncSession, member_ids: List[int], current_date: Optional[date] = None
+) -> List[dict]:
+    """
+    Loan counts and current loans of each member, in the order given and
+    skipping unknown ids. One statement: per-member counts grouped in a
+    subquery, joined to the members and to their open loans.
+    """
+    if current_date is None:
+        current_date = date.today()
+    member_ids = list(dict.fromkeys(member_ids))
+
+    is_open = Loan.return_date.is_(None)
+    counts = (
+        select(
+            Loan.member_id,
+            func.count().label("total_loans"),
+            func.sum(case((is_open, 1), else_=0)).label("active_loans"),
+            func.sum(case((and_(is_open, Loan.due_date < current_date), 1), else_=0)).label("overdue_loans"),
+        )
+        .where(Loan.member_id.in_(member_ids))
+        .group_by(Loan.member_id)
+        .subquery()
+    )
+    result = await db.execute(
+        select(
+            Member.id,
+            (Member.first_name + " " + Member.last_name).label("member_name"),
+            counts.c.total_loans,
+            counts.c.active_loans,
+            counts.c.overdue_loans,
+            Loan.id.label("loan_id"),
+            Loan.book_id,
+            func.coalesce(Book.title, "Unknown Book").label("book_title"),
+            Loan.loan_date,
+            Loan.due_date,
+        )
+        .select_from(Member)
+        .outerjoin(counts, counts.c.member_id == Member.id)
+        .outerjoin(Loan, and_(Loan.member_id == Member.id, is_open))
+        .outerjoin(Book, Book.id == Loan.book_id)
+        .where(Member.id.in_(member_ids))
+        .order_by(Member.id, Loan.due_date, Loan.id)
+    )
+
+    summaries = {}
+    for row in result:
+        summary = summaries.get(row.id)
+        if summary is None:
+            summary = summaries[row.id] = {
+                "member_id": row.id,
+                "member_name": row.member_name,
+                "active_loans": row.active_loans or 0,
+                "overdue_loans": row.overdue_loans or 0,
+                "total_loans": row.total_loans or 0,
+                "current_loans": [],
+            }
+        if row.loan_id is not None:
+            summary["current_loans"].append({
+                "loan_id": row.loan_id,
+                "book_id": row.book_id,
+                "book_title": row.book_title,
+                "loan_date": row.loan_date,
+                "due_date": row.due_date,
+                "overdue": row.due_date is not None and row.due_date < current_date,
+            })
+    return [summaries[member_id] for member_id in member_ids if member_id in summaries]
+
+
+async def create_member(db: AsyncSession, member: MemberCreate):
     """Create a new member"""
     db_member = Member(**member.model_dump())
     db.add(db_member)
-    db.commit()
-    db.refresh(db_member)
+    await stats.adjust(db, active_members=int(member.active))
+    await db.commit()
+    await db.refresh(db_member)
+    search.index_member(db_member)
     return db_member
 
 
-def update_member(db, member_id: int, member: MemberUpdate):
+async def update_member(db: AsyncSession, member_id: int, member: MemberUpdate):
     """Update a member"""
     # Filter out None values
     update_data = {k: v for k, v in member.model_dump().items() if v is not None}
     if not update_data:
-        return get_member(db, member_id)
+        return await get_member(db, member_id)
     
-    db.execute(
-        update(Member)
-        .where(Member.id == member_id)
-        .values(**update_data)
-    )
-    db.commit()
-    return get_member(db, member_id)
+    statement = update(Member).where(Member.id == member_id).values(**update_data)
+    active = update_data.get("active")
+    if active is None:
+        await db.execute(statement)
+    else:
+        # Only an update that changes the active flag moves the counter
+        was_active = Member.active.is_(True)
+        changed = await db.execute(
+            statement.where(~was_active if active else was_active).returning(Member.id)
+        )
+        if changed.scalar() is not None:
+            await stats.adjust(db, active_members=1 if active else -1)
+        else:
+            await db.execute(statement)
+    await db.commit()
+    cache.invalidate_entity(Member, member_id)
+    db_member = await get_member(db, member_id)
+    search.index_member(db_member)
+    return db_member
 
 
-def delete_member(db, member_id: int):
+async def delete_member(db: AsyncSession, member_id: int):
     """Delete a member"""
-    member = get_member(db, member_id)
+    member = await get_member(db, member_id)
     if member:
-        db.execute(delete(Member).where(Member.id == member_id))
-        db.commit()
-    return member
\ No newline at end of file
+        deleted = await db.execute(
+            delete(Member).where(Member.id == member_id).returning(Member.active)
+        )
+        for active in deleted.scalars():
+            await stats.adjust(db, active_members=-int(active is True))
+        await db.commit()
+        cache.invalidate_entity(Member, member_id)
+        search.unindex_member(member_id)
+    return member
+
+
+async def stream_members(db: AsyncSession, batch_size: int = 1000):
+    """Yield all members in id order, in batches, from a server-side cursor"""
+    result = await db.stream(
+        select(*Member.__table__.columns)
+        .order_by(Member.id)
+        .execution_options(yield_per=batch_size)
+    )
+    async for rows in result.mappings().partitions():
+        yield rows
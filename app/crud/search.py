@@ -0,0 +1,293 @@
+# Ranked search over books and members.
+#
+# PostgreSQL uses the tsvector / pg_trgm GIN indexes declared in
+# app/models/models.py. Other backends (SQLite test deployments) use an
+# in-process inverted index that is built on first use and kept current
+# by the book and member crud functions. Each worker process holds its own
+# copy and rebuilds it every SEARCH_INDEX_TTL_SECONDS, which picks up the
+# writes other workers made.
+
+import asyncio
+import bisect
+import math
+import re
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func, literal_column, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models.models import Book, Member, search_document
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Lowercased word tokens of ``text``"""
+    if not text:
+        return []
+    return _TOKEN_RE.findall(text.lower())
+
+
+class InvertedIndex:
+    """Term -> document postings with idf ranking.
+
+    Every query term must match (the last one as a prefix, so partially
+    typed words still find results). Each field has a weight; a document
+    scores the idf of each matched term times the best matching field weight.
+    """
+
+    def __init__(self, weights: Dict[str, float]):
+        self.weights = weights
+        self.ready = False
+        self.built_at = 0.0
+        self.build_lock = asyncio.Lock()
+        self._lock = threading.Lock()
+        self._postings: Dict[str, Dict[int, float]] = defaultdict(dict)
+        self._doc_terms: Dict[int, Dict[str, float]] = {}
+        self._vocabulary: List[str] = []
+        # Writes made while a new copy is being built, replayed onto it
+        self._pending: Optional[List[Tuple[int, Optional[Dict[str, Optional[str]]]]]] = None
+
+    @property
+    def tracking(self) -> bool:
+        """True if writes must be applied (the index is built or being built)"""
+        return self.ready or self._pending is not None
+
+    def stale(self, ttl: float) -> bool:
+        return not self.ready or (ttl > 0 and time.monotonic() - self.built_at > ttl)
+
+    def clear(self):
+        with self._lock:
+            self._postings.clear()
+            self._doc_terms.clear()
+            self._vocabulary = []
+            self._pending = None
+            self.ready = False
+
+    def begin_rebuild(self):
+        with self._lock:
+            self._pending = []
+
+    def abort_rebuild(self):
+        with self._lock:
+            self._pending = None
+
+    def finish_rebuild(self, fresh: "InvertedIndex"):
+        """Take over ``fresh``'s documents, plus the writes made since the rebuild began"""
+        with self._lock:
+            for doc_id, fields in self._pending or ():
+                if fields is None:
+                    fresh._remove(doc_id)
+                else:
+                    fresh._add(doc_id, fields)
+            self._postings = fresh._postings
+            self._doc_terms = fresh._doc_terms
+            self._vocabulary = fresh._vocabulary
+            self._pending = None
+            self.built_at = time.monotonic()
+            self.ready = True
+
+    def add(self, doc_id: int, fields: Dict[str, Optional[str]]):
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append((doc_id, fields))
+            self._add(doc_id, fields)
+
+    def _add(self, doc_id: int, fields: Dict[str, Optional[str]]):
+        self._remove(doc_id)
+        terms: Dict[str, float] = {}
+        for field, text in fields.items():
+            weight = self.weights.get(field, 1.0)
+            for term in tokenize(text):
+                if weight > terms.get(term, 0.0):
+                    terms[term] = weight
+        for term, weight in terms.items():
+            if term not in self._postings:
+                bisect.insort(self._vocabulary, term)
+            self._postings[term][doc_id] = weight
+        self._doc_terms[doc_id] = terms
+
+    def remove(self, doc_id: int):
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append((doc_id, None))
+            self._remove(doc_id)
+
+    def _remove(self, doc_id: int):
+        for term in self._doc_terms.pop(doc_id, {}):
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            postings.pop(doc_id, None)
+            if not postings:
+                del self._postings[term]
+                i = bisect.bisect_left(self._vocabulary, term)
+                if i < len(self._vocabulary) and self._vocabulary[i] == term:
+                    del self._vocabulary[i]
+
+    def _expand_prefix(self, prefix: str) -> List[str]:
+        i = bisect.bisect_left(self._vocabulary, prefix)
+        terms = []
+        while i < len(self._vocabulary) and self._vocabulary[i].startswith(prefix):
+            terms.append(self._vocabulary[i])
+            i += 1
+        return terms
+
+    def search(self, query: str, limit: int) -> List[Tuple[int, float]]:
+        """(doc_id, score) pairs for ``query``, best first"""
+        terms = tokenize(query)
+        if not terms:
+            return []
+        with self._lock:
+            total = max(len(self._doc_terms), 1)
+            scores: Optional[Dict[int, float]] = None
+            for position, term in enumerate(terms):
+                expanded = [term]
+                if position == len(terms) - 1:
+                    expanded = self._expand_prefix(term)
+                matched: Dict[int, float] = {}
+                for candidate in expanded:
+                    postings = self._postings.get(candidate, {})
+                    idf = math.log(1 + total / len(postings)) if postings else 0.0
+                    for doc_id, weight in postings.items():
+                        score = idf * weight
+                        if score > matched.get(doc_id, 0.0):
+                            matched[doc_id] = score
+                if scores is None:
+                    scores = matched
+                else:
+                    scores = {
+                        doc_id: score + matched[doc_id]
+                        for doc_id, score in scores.items()
+                        if doc_id in matched
+                    }
+                if not scores:
+                    return []
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return ranked[:limit]
+
+
+book_index = InvertedIndex({"title": 2.0, "author": 1.0})
+# Same fields as the PostgreSQL search documents, so both backends match alike
+member_index = InvertedIndex({"first_name": 1.0, "last_name": 1.0})
+
+
+def book_fields(book) -> Dict[str, Optional[str]]:
+    return {"title": book.title, "author": book.author}
+
+
+def member_fields(member) -> Dict[str, Optional[str]]:
+    return {"first_name": member.first_name, "last_name": member.last_name}
+
+
+def index_book(book):
+    """Keep the fallback index current after a book is written"""
+    if book_index.tracking and book is not None:
+        book_index.add(book.id, book_fields(book))
+
+
+def unindex_book(book_id: int):
+    if book_index.tracking:
+        book_index.remove(book_id)
+
+
+def index_member(member):
+    """Keep the fallback index current after a member is written"""
+    if member_index.tracking and member is not None:
+        member_index.add(member.id, member_fields(member))
+
+
+def unindex_member(member_id: int):
+    if member_index.tracking:
+        member_index.remove(member_id)
+
+
+def _is_postgres(db: AsyncSession) -> bool:
+    return db.get_bind().dialect.name == "postgresql"
+
+
+async def _ensure_index(db: AsyncSession, index: InvertedIndex, model) -> None:
+    """Build the index on first use, and rebuild it once it is older than the TTL"""
+    ttl = settings.SEARCH_INDEX_TTL_SECONDS
+    if not index.stale(ttl):
+        return
+    if index.ready and index.build_lock.locked():
+        return  # another request is rebuilding; serve the current copy meanwhile
+    async with index.build_lock:
+        if not index.stale(ttl):
+            return
+        # Build a fresh copy; writes made meanwhile are replayed onto it
+        fresh = InvertedIndex(index.weights)
+        index.begin_rebuild()
+        try:
+            columns = [getattr(model, name) for name in index.weights]
+            result = await db.stream(
+                select(model.id, *columns).execution_options(yield_per=1000)
+            )
+            async for row in result:
+                fresh.add(row[0], dict(zip(index.weights, row[1:])))
+        except BaseException:
+            index.abort_rebuild()
+            raise
+        index.finish_rebuild(fresh)
+
+
+async def _fetch_ranked(db: AsyncSession, model, ranked: Iterable[Tuple[int, float]]):
+    ids = [doc_id for doc_id, _ in ranked]
+    if not ids:
+        return []
+    result = await db.execute(select(model).where(model.id.in_(ids)))
+    by_id = {row.id: row for row in result.scalars().all()}
+    return [by_id[doc_id] for doc_id in ids if doc_id in by_id]
+
+
+async def search_books(db: AsyncSession, q: str, limit: int = 20):
+    """Books matching ``q`` on title/author, most relevant first"""
+    if _is_postgres(db):
+        document = search_document(Book.title, Book.author)
+        ts_query = func.plainto_tsquery(literal_column("'simple'"), q)
+        rank = func.ts_rank(document, ts_query) + func.greatest(
+            func.similarity(Book.title, q), func.similarity(Book.author, q)
+        )
+        result = await db.execute(
+            select(Book)
+            .where(or_(
+                document.op("@@")(ts_query),
+                Book.title.op("%")(q),
+                Book.author.op("%")(q),
+            ))
+            .order_by(rank.desc(), Book.id)
+            .limit(limit)
+        )
+        return result.scalars().all()
+
+    await _ensure_index(db, book_index, Book)
+    return await _fetch_ranked(db, Book, book_index.search(q, limit))
+
+
+async def search_members(db: AsyncSession, q: str, limit: int = 20):
+    """Members matching ``q`` on first/last name, most relevant first"""
+    if _is_postgres(db):
+        document = search_document(Member.first_name, Member.last_name)
+        ts_query = func.plainto_tsquery(literal_column("'simple'"), q)
+        rank = func.ts_rank(document, ts_query) + func.greatest(
+            func.similarity(Member.first_name, q), func.similarity(Member.last_name, q)
+        )
+        result = await db.execute(
+            select(Member)
+            .where(or_(
+                document.op("@@")(ts_query),
+                Member.first_name.op("%")(q),
+                Member.last_name.op("%")(q),
+            ))
+            .order_by(rank.desc(), Member.id)
+            .limit(limit)
+        )
+        return result.scalars().all()
+
+    await _ensure_index(db, member_index, Member)
+    return await _fetch_ranked(db, Member, member_index.search(q, limit))
@@ -0,0 +1,137 @@
+# Library statistics as maintained counters. Writes adjust the counters in
+# their own transaction (see adjust()), so GET /stats sums a few rows per
+# counter by primary key instead of counting books and loans. reconcile()
+# recounts everything periodically, which also rolls "overdue" forward to today.
+#
+# Each counter is split over SHARDS rows. A transaction adjusts only the
+# shard picked for its session, so concurrent writes on PostgreSQL wait on
+# each other's row locks only when they pick the same shard, instead of all
+# queueing behind one row per counter.
+
+import random
+from datetime import date, datetime, timezone
+from typing import Dict, Optional
+
+from sqlalchemy import and_, case, func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.models import Book, LibraryStat, Loan, Member
+
+COUNTERS = ("total_books", "available_books", "active_loans", "overdue_loans", "active_members")
+
+# Must match SHARDS in migrations/versions/0008_library_stat_shards.py
+SHARDS = 8
+
+
+def _counts(current_date: date):
+    """Query counting each statistic from scratch"""
+    is_open = Loan.return_date.is_(None)
+    return {
+        "total_books": select(func.count()).select_from(Book),
+        "available_books": select(func.count()).select_from(Book).where(Book.available.is_(True)),
+        "active_loans": select(func.count()).select_from(Loan).where(is_open),
+        "overdue_loans": select(func.count()).select_from(Loan).where(is_open, Loan.due_date < current_date),
+        "active_members": select(func.count()).select_from(Member).where(Member.active.is_(True)),
+    }
+
+
+def _shard(db: AsyncSession) -> int:
+    # One shard per session, so a transaction calling adjust() twice locks
+    # rows of a single shard and cannot deadlock with another writer
+    return db.info.setdefault("stats_shard", random.randrange(SHARDS))
+
+
+async def adjust(db: AsyncSession, due_date: Optional[date] = None, **deltas: int) -> None:
+    """
+    Add ``deltas`` to the named counters with one UPDATE of this session's
+    shard. Call it in the transaction of the write being counted, just
+    before its commit, so the counters change exactly when that write does.
+    An overdue_loans delta only applies if ``due_date`` (of the loan) is
+    before the counter's ``as_of`` date, i.e. if the loan was counted as
+    overdue there.
+    """
+    whens = []
+    for name, delta in deltas.items():
+        if name not in COUNTERS:
+            raise ValueError(f"Unknown statistic {name!r}")
+        if not delta:
+            continue
+        condition = LibraryStat.name == name
+        if name == "overdue_loans":
+            if due_date is None:
+                continue
+            condition = and_(condition, LibraryStat.as_of > due_date)
+        whens.append((condition, delta))
+    if not whens:
+        return
+    await db.execute(
+        update(LibraryStat)
+        .where(LibraryStat.name.in_(list(deltas)), LibraryStat.shard == _shard(db))
+        .values(value=LibraryStat.value + case(*whens, else_=0))
+    )
+
+
+async def get_stats(db: AsyncSession) -> Dict:
+    """The counters by name, with the date and time they were last reconciled"""
+    result = await db.execute(
+        select(
+            LibraryStat.name,
+            func.sum(LibraryStat.value).label("value"),
+            func.max(LibraryStat.as_of).label("as_of"),
+            func.max(LibraryStat.reconciled_at).label("reconciled_at"),
+        )
+        .where(LibraryStat.name.in_(COUNTERS))
+        .group_by(LibraryStat.name)
+    )
+    stats = {name: 0 for name in COUNTERS}
+    stats["as_of"] = stats["reconciled_at"] = None
+    for row in result:
+        # sum() of a bigint is a numeric on PostgreSQL
+        stats[row.name] = int(row.value)
+        stats["as_of"] = row.as_of
+        stats["reconciled_at"] = row.reconciled_at
+    return stats
+
+
+async def reconcile(db: AsyncSession, current_date: Optional[date] = None) -> Dict:
+    """
+    Recount every statistic in one UPDATE and commit, correcting any drift
+    (e.g. from rows written outside the API) and counting loans overdue as
+    of ``current_date``. The count goes to shard 0 and the other shards
+    restart from zero. Returns the reconciled stats.
+    """
+    if current_date is None:
+        current_date = date.today()
+    existing = set(
+        (await db.execute(
+            select(LibraryStat.name, LibraryStat.shard).where(LibraryStat.name.in_(COUNTERS))
+        )).tuples()
+    )
+    missing = [
+        {"name": name, "shard": shard, "value": 0}
+        for name in COUNTERS for shard in range(SHARDS) if (name, shard) not in existing
+    ]
+    if missing:
+        await db.execute(insert(LibraryStat), missing)
+
+    counts = _counts(current_date)
+    await db.execute(
+        update(LibraryStat)
+        .where(LibraryStat.name.in_(COUNTERS))
+        .values(
+            value=case(
+                (
+                    LibraryStat.shard == 0,
+                    case(
+                        {name: query.scalar_subquery() for name, query in counts.items()},
+                        value=LibraryStat.name,
+                    ),
+                ),
+                else_=0,
+            ),
+            as_of=current_date,
+            reconciled_at=datetime.now(timezone.utc),
+        )
+    )
+    await db.commit()
+    return await get_stats(db)
@@ -0,0 +1,66 @@
+# Cheap change detection for conditional GETs. Instead of loading and
+# serialising rows, aggregate the ids, timestamps and revision counters of
+# the rows a query would return: any insert, delete or update among them
+# changes the result. Timestamps alone are not enough, since two updates can
+# land within one tick (a second for SQLite's CURRENT_TIMESTAMP).
+
+from datetime import datetime
+from typing import NamedTuple, Optional, Sequence
+
+from sqlalchemy import func, literal, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+class Version(NamedTuple):
+    rows: int
+    id_sum: int
+    last_modified: Optional[datetime]
+    revisions: int = 0
+
+
+def _latest(values) -> Optional[datetime]:
+    values = [value for value in values if value is not None]
+    return max(values) if values else None
+
+
+def entities_version(entities, *timestamps: str) -> Version:
+    """Version of already loaded entities from their ``timestamps`` and ``revision`` attributes"""
+    return Version(
+        len(entities),
+        sum(entity.id for entity in entities),
+        _latest(getattr(entity, name) for entity in entities for name in timestamps),
+        sum(entity.revision or 0 for entity in entities),
+    )
+
+
+def entity_version(entity, *timestamps: str) -> Version:
+    """Version of one loaded entity from its ``timestamps`` attributes"""
+    return entities_version([entity], *timestamps)
+
+
+async def query_version(
+    db: AsyncSession, query, id_column, *timestamps, revisions: Sequence = ()
+) -> Version:
+    """
+    Version of the rows ``query`` selects (filters, order and limit kept),
+    reading only ``id_column``, the ``timestamps`` and the ``revisions`` columns.
+    """
+    rows = query.with_only_columns(
+        id_column.label("id"),
+        *(column.label(f"ts{i}") for i, column in enumerate(timestamps)),
+        *(column.label(f"rev{i}") for i, column in enumerate(revisions)),
+    ).subquery()
+    revision_sum = sum(
+        (func.coalesce(func.sum(rows.c[f"rev{i}"]), 0) for i in range(len(revisions))),
+        literal(0),
+    )
+    result = await db.execute(
+        select(
+            func.count(),
+            func.coalesce(func.sum(rows.c.id), 0),
+            revision_sum,
+            *(func.max(rows.c[f"ts{i}"]) for i in range(len(timestamps))),
+        )
+    )
+    count, id_sum, revision_total, *latest = result.one()
+    return Version(count, id_sum, _latest(latest), revision_total)
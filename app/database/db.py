@@ -1,31 +1,183 @@
-# In furture , it will be async
+# Database engines and sessions.
+# The API runs on the async engine; the sync engine is kept for scripts.
+# With DATABASE_REPLICA_URLS set, read-only routes use get_read_db, which
+# picks a replica engine unless the client wrote recently (see routing.py).
 
+import itertools
+from typing import List
+
+from fastapi import Request
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 
 from app.config import settings
+from app.database import routing
+from app.database.pool import TimedQueuePool, pool_status
+from app.database.slow_query import SlowQueryLog, instrument_engine
+
+# Driver used for each backend when talking to it asynchronously
+ASYNC_DRIVERS = {
+    "postgresql": "asyncpg",
+    "sqlite": "aiosqlite",
+}
+
+
+def async_database_url(url: str) -> str:
+    """Return the URL with the async driver for its backend"""
+    db_url = make_url(url)
+    backend = db_url.get_backend_name()
+    driver = ASYNC_DRIVERS.get(backend)
+    if driver is None:
+        return url
+    return db_url.set(drivername=f"{backend}+{driver}").render_as_string(hide_password=False)
+
 
-# Use a synchronous 
-SQLALCHEMY_DATABASE_URL = settings.DATABASE_URL.replace("+asyncpg", "")
+def sync_database_url(url: str) -> str:
+    """Return the URL with the default (sync) driver for its backend"""
+    db_url = make_url(url)
+    return db_url.set(drivername=db_url.get_backend_name()).render_as_string(hide_password=False)
 
-engine = create_engine(
+
+def engine_options(url: str) -> dict:
+    """Engine keyword arguments built from the pool settings"""
+    options = {"echo": settings.DB_ECHO}
+    db_url = make_url(url)
+    if db_url.get_backend_name() == "sqlite" and db_url.database in (None, "", ":memory:"):
+        # An in-memory SQLite database only exists on its one connection
+        return options
+    options.update(
+        poolclass=TimedQueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+    )
+    return options
+
+
+SQLALCHEMY_DATABASE_URL = async_database_url(settings.DATABASE_URL)
+
+engine = create_async_engine(
     SQLALCHEMY_DATABASE_URL,
-    echo=True,
+    **engine_options(SQLALCHEMY_DATABASE_URL),
 )
 
-SessionLocal = sessionmaker(
-    autocommit=False,
-    autoflush=False,
+slow_query_log = SlowQueryLog(
+    threshold_ms=settings.SLOW_QUERY_THRESHOLD_MS,
+    buffer_size=settings.SLOW_QUERY_BUFFER_SIZE,
+    explain_sample_rate=settings.SLOW_QUERY_EXPLAIN_SAMPLE_RATE,
+    explain_analyze=settings.SLOW_QUERY_EXPLAIN_ANALYZE,
+    log_parameters=settings.SLOW_QUERY_LOG_PARAMETERS,
+)
+
+REPLICA_URLS = [
+    async_database_url(url.strip())
+    for url in settings.DATABASE_REPLICA_URLS.split(",")
+    if url.strip()
+]
+replica_engines = [create_async_engine(url, **engine_options(url)) for url in REPLICA_URLS]
+
+if settings.SLOW_QUERY_LOG_ENABLED:
+    for each in (engine, *replica_engines):
+        instrument_engine(each.sync_engine, slow_query_log)
+
+# expire_on_commit is off so objects can still be read after commit
+# without an implicit (and, under asyncio, illegal) lazy refresh.
+SessionLocal = async_sessionmaker(
     bind=engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False,
 )
 
+# Replica sessions are marked in Session.info; see is_replica_session()
+ReplicaSessions = [
+    async_sessionmaker(
+        bind=replica_engine,
+        class_=AsyncSession,
+        autoflush=False,
+        expire_on_commit=False,
+        info={"replica": True},
+    )
+    for replica_engine in replica_engines
+]
+_next_replica = itertools.cycle(ReplicaSessions)
+
 Base = declarative_base()
 
-# Synchronous dependency
-def get_db():
-    db = SessionLocal()
-    try:
+
+def all_engines() -> List:
+    """The primary engine followed by the replica engines"""
+    return [engine, *replica_engines]
+
+
+def get_pool_status() -> dict:
+    """Occupancy and wait statistics of the API engine's pool"""
+    return pool_status(engine.pool)
+
+
+def get_replica_pool_status() -> List[dict]:
+    return [pool_status(replica_engine.pool) for replica_engine in replica_engines]
+
+
+def is_replica_session(session) -> bool:
+    """True for sessions (sync or async) reading from a replica"""
+    return bool(session is not None and session.info.get("replica"))
+
+
+def read_sessions(request: Request) -> async_sessionmaker:
+    """
+    Session factory for a read-only request: the next replica, round
+    robin, or the primary if there is none or the client wrote within
+    the read-your-writes window.
+    """
+    if not ReplicaSessions or routing.wrote_recently(request):
+        return SessionLocal
+    return next(_next_replica)
+
+
+async def get_db():
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
\ No newline at end of file
+
+
+async def get_read_db(request: Request):
+    """Session for read-only routes (see read_sessions)"""
+    async with read_sessions(request)() as db:
+        yield db
+
+
+async def dispose_engines() -> None:
+    for each in all_engines():
+        await each.dispose()
+
+
+# Sync mode for scripts and one-off jobs. Built lazily so the API
+# never needs the sync DBAPI driver installed.
+_sync_engine = None
+_SyncSessionLocal = None
+
+
+def get_sync_engine():
+    global _sync_engine
+    if _sync_engine is None:
+        _sync_engine = create_engine(sync_database_url(settings.DATABASE_URL), echo=settings.DB_ECHO)
+        if settings.SLOW_QUERY_LOG_ENABLED:
+            instrument_engine(_sync_engine, slow_query_log)
+    return _sync_engine
+
+
+def get_sync_db() -> Session:
+    """Open a synchronous session, e.g. ``with get_sync_db() as db: ...``"""
+    global _SyncSessionLocal
+    if _SyncSessionLocal is None:
+        _SyncSessionLocal = sessionmaker(
+            autocommit=False,
+            autoflush=False,
+            bind=get_sync_engine(),
+        )
+    return _SyncSessionLocal()
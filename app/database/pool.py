@@ -0,0 +1,87 @@
+# Connection pool with checkout timing, reported on /health
+
+import threading
+import time
+
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app.metrics import record_pool_wait
+
+
+class PoolWaitStats:
+    """Running totals of how long callers waited for a pool connection"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.checkouts = 0
+        self.failures = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record(self, seconds: float, failed: bool = False):
+        with self._lock:
+            if failed:
+                self.failures += 1
+            else:
+                self.checkouts += 1
+            self.total_wait += seconds
+            if seconds > self.max_wait:
+                self.max_wait = seconds
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            waits = self.checkouts + self.failures
+            return {
+                "checkouts": self.checkouts,
+                "failures": self.failures,
+                "wait_total_ms": round(self.total_wait * 1000, 3),
+                "wait_avg_ms": round(self.total_wait * 1000 / waits, 3) if waits else 0.0,
+                "wait_max_ms": round(self.max_wait * 1000, 3),
+            }
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool that records the time spent obtaining a connection"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_stats = PoolWaitStats()
+
+    def recreate(self) -> "TimedQueuePool":
+        # engine.dispose() replaces the pool; this engine's totals carry over
+        pool = super().recreate()
+        pool.wait_stats = self.wait_stats
+        return pool
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except Exception:
+            elapsed = time.perf_counter() - start
+            self.wait_stats.record(elapsed, failed=True)
+            record_pool_wait(elapsed, failed=True)
+            raise
+        elapsed = time.perf_counter() - start
+        self.wait_stats.record(elapsed)
+        record_pool_wait(elapsed)
+        return conn
+
+
+def pool_status(pool) -> dict:
+    """Current occupancy of ``pool`` plus the accumulated wait statistics"""
+    status = {"pool": pool.__class__.__name__}
+    if isinstance(pool, AsyncAdaptedQueuePool):
+        status.update(
+            size=pool.size(),
+            checked_out=pool.checkedout(),
+            idle=pool.checkedin(),
+            overflow=max(pool.overflow(), 0),
+            max_overflow=pool._max_overflow,
+        )
+    if isinstance(pool, TimedQueuePool):
+        status.update(pool.wait_stats.snapshot())
+    return status
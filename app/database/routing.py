@@ -0,0 +1,60 @@
+# Read-your-writes for read/write splitting. A successful write response
+# carries a short-lived cookie; while a client presents it, its reads go
+# to the primary instead of a replica that may not have the write yet.
+# A cookie works across worker processes without any shared state.
+
+import time
+from http.cookies import SimpleCookie
+
+from starlette.requests import HTTPConnection
+
+from app.config import settings
+
+COOKIE_NAME = "read_primary_until"
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+def wrote_recently(request: HTTPConnection) -> bool:
+    """True if the client made a write within the read-your-writes window"""
+    until = request.cookies.get(COOKIE_NAME)
+    if not until:
+        return False
+    try:
+        until = float(until)
+    except ValueError:
+        return False
+    # Capped, so a forged cookie cannot pin a client to the primary for long
+    now = time.time()
+    return now < until <= now + settings.READ_YOUR_WRITES_SECONDS
+
+
+def _cookie_header(until: float) -> bytes:
+    cookie = SimpleCookie()
+    cookie[COOKIE_NAME] = f"{until:.3f}"
+    cookie[COOKIE_NAME]["max-age"] = int(settings.READ_YOUR_WRITES_SECONDS) + 1
+    cookie[COOKIE_NAME]["path"] = "/"
+    cookie[COOKIE_NAME]["httponly"] = True
+    cookie[COOKIE_NAME]["samesite"] = "lax"
+    return cookie.output(header="").strip().encode("latin-1")
+
+
+class ReadYourWritesMiddleware:
+    """ASGI middleware marking clients after a successful write"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in SAFE_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                until = time.time() + settings.READ_YOUR_WRITES_SECONDS
+                headers = list(message.get("headers", []))
+                headers.append((b"set-cookie", _cookie_header(until)))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
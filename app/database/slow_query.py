@@ -0,0 +1,155 @@
+# Slow-query log with sampled EXPLAIN capture.
+#
+# Statements slower than SLOW_QUERY_THRESHOLD_MS are logged with their
+# parameters, duration and the app function that issued them, and kept
+# in a bounded ring buffer readable from /admin/slow-queries. A sample
+# of slow SELECTs also gets its plan captured.
+
+import logging
+import random
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+try:
+    import greenlet
+except ImportError:  # pragma: no cover - greenlet ships with SQLAlchemy's asyncio extra
+    greenlet = None
+
+# Frames from these modules are plumbing, never "the caller"
+_SKIP_MODULES = ("app.database", "app.metrics")
+
+
+def _issuing_function() -> Optional[str]:
+    """
+    Name the app function that issued the current statement, preferring
+    crud functions. Under asyncio the statement runs in a SQLAlchemy
+    greenlet, so the walk continues into the parent greenlet's frames.
+    """
+    fallback = None
+    frame = sys._getframe(1)
+    current = greenlet.getcurrent() if greenlet else None
+    while True:
+        while frame is not None:
+            module = frame.f_globals.get("__name__", "")
+            if module.startswith("app.") and not module.startswith(_SKIP_MODULES):
+                name = f"{module}.{frame.f_code.co_name}"
+                if module.startswith("app.crud"):
+                    return name
+                fallback = fallback or name
+            frame = frame.f_back
+        current = current.parent if current is not None else None
+        if current is None:
+            return fallback
+        frame = current.gr_frame
+
+
+class SlowQueryLog:
+    def __init__(
+        self,
+        threshold_ms: float = 200.0,
+        buffer_size: int = 100,
+        explain_sample_rate: float = 0.0,
+        explain_analyze: bool = False,
+        log_parameters: bool = False,
+    ):
+        self.threshold = threshold_ms / 1000
+        self.explain_sample_rate = explain_sample_rate
+        self.explain_analyze = explain_analyze
+        self.log_parameters = log_parameters
+        self._entries = deque(maxlen=buffer_size)
+        self._lock = threading.Lock()
+        self.total = 0
+
+    def entries(self) -> List[dict]:
+        """Recorded slow queries, most recent first"""
+        with self._lock:
+            return list(reversed(self._entries))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("slow_query_start", []).append(time.perf_counter())
+
+    def after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["slow_query_start"].pop()
+        if elapsed < self.threshold:
+            return
+        entry = {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "duration_ms": round(elapsed * 1000, 3),
+            "statement": statement,
+            "parameters": _short_repr(parameters) if self.log_parameters else None,
+            "executemany": executemany,
+            "caller": _issuing_function(),
+            "plan": None,
+        }
+        if self._should_explain(statement, executemany, context):
+            entry["plan"] = self._explain(conn, statement, parameters)
+        logger.warning(
+            "Slow query (%.1f ms) from %s: %s %s",
+            entry["duration_ms"], entry["caller"], statement, entry["parameters"] or "",
+        )
+        with self._lock:
+            self._entries.append(entry)
+            self.total += 1
+
+    def handle_error(self, exception_context):
+        # A failed statement never reaches after_cursor_execute
+        connection = exception_context.connection
+        starts = connection.info.get("slow_query_start") if connection is not None else None
+        if starts:
+            starts.pop()
+
+    def _should_explain(self, statement: str, executemany: bool, context) -> bool:
+        if executemany or self.explain_sample_rate <= 0:
+            return False
+        # Only plain SELECTs: EXPLAIN ANALYZE would re-run a write, and an
+        # open server-side cursor cannot share its connection
+        if not statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            return False
+        if context is not None and context.execution_options.get("stream_results"):
+            return False
+        return random.random() < self.explain_sample_rate
+
+    def _explain(self, conn, statement: str, parameters) -> Optional[str]:
+        dialect = conn.dialect.name
+        if dialect == "postgresql":
+            prefix = "EXPLAIN (ANALYZE, BUFFERS) " if self.explain_analyze else "EXPLAIN "
+        elif dialect == "sqlite":
+            prefix = "EXPLAIN QUERY PLAN "
+        else:
+            prefix = "EXPLAIN "
+        # A raw DBAPI cursor keeps the EXPLAIN itself out of the event hooks
+        try:
+            cursor = conn.connection.cursor()
+            try:
+                cursor.execute(prefix + statement, parameters)
+                rows = cursor.fetchall()
+            finally:
+                cursor.close()
+        except Exception as exc:
+            logger.debug("EXPLAIN failed: %s", exc)
+            return None
+        return "\n".join(" ".join(str(value) for value in row) for row in rows)
+
+
+def _short_repr(value, limit: int = 500) -> str:
+    text = repr(value)
+    return text if len(text) <= limit else text[:limit] + "..."
+
+
+def instrument_engine(sync_engine, slow_log: SlowQueryLog) -> None:
+    """Attach ``slow_log`` to ``sync_engine`` (``engine.sync_engine`` for async engines)"""
+    event.listen(sync_engine, "before_cursor_execute", slow_log.before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", slow_log.after_cursor_execute)
+    event.listen(sync_engine, "handle_error", slow_log.handle_error)
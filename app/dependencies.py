@@ -1,5 +1,6 @@
 # This is the dependencies
-from fastapi import HTTPException, status
+from typing import List, Optional
+from fastapi import HTTPException, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.crud import book as book_crud
 from app.crud import member as member_crud
@@ -33,4 +34,24 @@ async def validate_loan_exists(loan_id: int, db: AsyncSession):
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Loan with ID {loan_id} not found"
         )
-    return loan
\ No newline at end of file
+    return loan
+
+# Most ids a single batch lookup accepts
+MAX_BATCH_IDS = 500
+
+
+def batch_ids(
+    ids: Optional[str] = Query(
+        None, pattern=r"^\d+(,\d+)*$", description="Comma-separated ids to fetch in one query"
+    )
+) -> Optional[List[int]]:
+    """Parse ``?ids=1,2,3`` for batch lookups"""
+    if ids is None:
+        return None
+    parsed = [int(value) for value in ids.split(",")]
+    if len(parsed) > MAX_BATCH_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {MAX_BATCH_IDS} ids per request"
+        )
+    return parsed
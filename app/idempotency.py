@@ -0,0 +1,148 @@
+# Idempotency-Key for the create POSTs. The first request with a key runs
+# and its response (anything but a 5xx) is stored; a retry with the same
+# key and body gets that response replayed without touching the domain
+# tables. Keys live in the database, so a retry landing on another worker
+# process is replayed too.
+
+import hashlib
+
+import orjson
+from starlette.datastructures import Headers
+from starlette.routing import Match
+
+from app import metrics
+from app.config import settings
+from app.crud import idempotency as idempotency_crud
+from app.database.db import SessionLocal
+
+HEADER = "idempotency-key"
+MAX_KEY_LENGTH = 255
+
+# Route paths (after API_PREFIX) that honour the header
+IDEMPOTENT_ROUTES = ("/books/", "/members/", "/loans/", "/loans/batch")
+
+
+def fingerprint(scope, body: bytes) -> str:
+    """Hash of what makes two requests with one key the same request"""
+    digest = hashlib.sha256()
+    for part in (scope["method"].encode(), scope["path"].encode(), scope["query_string"], body):
+        digest.update(len(part).to_bytes(8, "big") + part)
+    return digest.hexdigest()
+
+
+class IdempotencyMiddleware:
+    """ASGI middleware storing and replaying responses by Idempotency-Key"""
+
+    def __init__(self, app, router):
+        self.app = app
+        self.router = router
+        self.paths = {settings.API_PREFIX + path for path in IDEMPOTENT_ROUTES}
+
+    def set_route(self, scope) -> None:
+        # What the router would set, so that answers given here (which never
+        # reach it) are labelled with the route template in /metrics
+        for route in self.router.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                scope["route"] = route
+                return
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+        key = Headers(scope=scope).get(HEADER)
+        if key is None:
+            await self.app(scope, receive, send)
+            return
+        if not key or len(key) > MAX_KEY_LENGTH:
+            self.set_route(scope)
+            await _send_json(send, 400, f"Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters")
+            return
+
+        # The create bodies are small; read it whole to fingerprint the request
+        chunks = []
+        while True:
+            message = await receive()
+            if message["type"] != "http.request":
+                return  # the client went away
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                break
+        body = b"".join(chunks)
+        path, request_fingerprint = scope["path"], fingerprint(scope, body)
+
+        async with SessionLocal() as db:
+            record = await idempotency_crud.claim(
+                db, path, key, request_fingerprint, settings.IDEMPOTENCY_LOCK_SECONDS
+            )
+        if record is not None:
+            self.set_route(scope)
+            await self.answer_retry(record, request_fingerprint, send)
+            return
+
+        replayed_body = False
+
+        async def replay_receive():
+            nonlocal replayed_body
+            if not replayed_body:
+                replayed_body = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        status_code, content_type, response_body = 500, None, []
+
+        async def capture(message):
+            nonlocal status_code, content_type
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                content_type = Headers(raw=message.get("headers", [])).get("content-type")
+            elif message["type"] == "http.response.body":
+                response_body.append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, replay_receive, capture)
+        finally:
+            # A server error is not an answer; let the client's retry run again
+            async with SessionLocal() as db:
+                if status_code < 500:
+                    await idempotency_crud.store(
+                        db, path, key, status_code, content_type, b"".join(response_body),
+                        settings.IDEMPOTENCY_TTL_SECONDS,
+                    )
+                    metrics.idempotency_requests.inc("stored")
+                else:
+                    await idempotency_crud.release(db, path, key)
+                    metrics.idempotency_requests.inc("released")
+
+    async def answer_retry(self, record, request_fingerprint: str, send) -> None:
+        if record.fingerprint != request_fingerprint:
+            metrics.idempotency_requests.inc("mismatch")
+            await _send_json(send, 422, "Idempotency-Key was already used for a different request")
+        elif record.status_code is None:
+            metrics.idempotency_requests.inc("in_progress")
+            await _send_json(send, 409, "A request with this Idempotency-Key is still in progress")
+        else:
+            metrics.idempotency_requests.inc("replayed")
+            headers = [
+                (b"content-length", str(len(record.body)).encode()),
+                (b"idempotent-replayed", b"true"),
+            ]
+            if record.content_type:
+                headers.append((b"content-type", record.content_type.encode("latin-1")))
+            await send({"type": "http.response.start", "status": record.status_code, "headers": headers})
+            await send({"type": "http.response.body", "body": record.body})
+
+
+async def _send_json(send, status_code: int, detail: str) -> None:
+    body = orjson.dumps({"detail": detail})
+    await send({
+        "type": "http.response.start",
+        "status": status_code,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,64 @@
+# Background jobs run by the scheduler (app/scheduler.py) while a worker
+# is serving. Each keeps its transactions short and its batches bounded,
+# so it never holds locks or a pool connection for long.
+
+import asyncio
+from datetime import date
+
+from app.cache import get_cache
+from app.config import settings
+from app.crud import idempotency as idempotency_crud
+from app.crud import loan as loan_crud
+from app.crud import stats as stats_crud
+from app.database.db import SessionLocal
+from app.scheduler import Scheduler
+
+
+async def sweep_overdue_loans() -> str:
+    """Mark loans that have become overdue, a batch per transaction"""
+    marked = 0
+    for _ in range(settings.OVERDUE_SWEEP_MAX_BATCHES):
+        async with SessionLocal() as db:
+            count = await loan_crud.mark_overdue_loans(
+                db, date.today(), settings.OVERDUE_SWEEP_BATCH_SIZE
+            )
+        marked += count
+        if count < settings.OVERDUE_SWEEP_BATCH_SIZE:
+            break
+        # Let waiting requests have the event loop between batches
+        await asyncio.sleep(0)
+    return f"{marked} loans marked overdue"
+
+
+async def reconcile_stats() -> str:
+    """Recount the /stats counters (this also rolls "overdue" forward to today)"""
+    async with SessionLocal() as db:
+        stats = await stats_crud.reconcile(db)
+    return f"stats as of {stats['as_of']}"
+
+
+async def prune_cache() -> str:
+    """Drop this worker's expired entity-cache entries"""
+    return f"{get_cache().prune()} cache entries pruned"
+
+
+async def prune_idempotency_keys() -> str:
+    """Delete stored Idempotency-Key responses past their TTL"""
+    async with SessionLocal() as db:
+        pruned = await idempotency_crud.prune(db)
+    return f"{pruned} idempotency keys pruned"
+
+
+def build_scheduler() -> Scheduler:
+    jitter = settings.SCHEDULER_JITTER
+    scheduler = Scheduler()
+    scheduler.add("overdue_sweep", sweep_overdue_loans, settings.OVERDUE_SWEEP_SECONDS, jitter=jitter)
+    scheduler.add("stats_reconcile", reconcile_stats, settings.STATS_RECONCILE_SECONDS, jitter=jitter)
+    scheduler.add(
+        "idempotency_prune", prune_idempotency_keys, settings.IDEMPOTENCY_PRUNE_SECONDS, jitter=jitter
+    )
+    # The cache lives in each worker's memory, so every worker prunes its own
+    scheduler.add(
+        "cache_prune", prune_cache, settings.CACHE_PRUNE_SECONDS, leader_only=False, jitter=jitter
+    )
+    return scheduler
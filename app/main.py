@@ -1,10 +1,21 @@
 # This is our main.py 
-from fastapi import FastAPI
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, status
+from fastapi.responses import JSONResponse, PlainTextResponse
+from sqlalchemy import text
 from fastapi.middleware.cors import CORSMiddleware
 import logging
 from app.api import api_router  
+from app.api.compression import CompressionMiddleware
 from app.config import settings
-from app.database.db import Base, engine
+from app.database.db import (
+    all_engines, dispose_engines, get_pool_status, get_replica_pool_status, replica_engines,
+)
+from app.database.routing import ReadYourWritesMiddleware
+from app.cache import get_cache
+from app import admission, jobs, metrics, warmup
+from app.idempotency import IdempotencyMiddleware
 
 # Configure logging
 logging.basicConfig(
@@ -13,13 +24,56 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+
+# The schema is managed by migrations (`alembic upgrade head`, once per
+# deploy); a worker only warms up before it starts serving
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    logger.info("Starting up...")
+    start = time.perf_counter()
+    try:
+        opened = 0
+        for each in all_engines():
+            opened += await warmup.open_pool_connections(each, settings.DB_POOL_WARMUP)
+        if settings.WARMUP_PRIME_CACHES:
+            await warmup.prime_caches()
+        logger.info(
+            "Warm-up done in %.1f ms (%d connections opened)",
+            (time.perf_counter() - start) * 1000, opened,
+        )
+    except Exception as exc:
+        # Serve cold rather than not at all; /health/db reports the database
+        logger.warning("Warm-up failed (is the schema migrated?): %s", exc)
+    scheduler = jobs.build_scheduler() if settings.SCHEDULER_ENABLED else None
+    if scheduler is not None:
+        scheduler.start()
+    yield
+    logger.info("Shutting down...")
+    if scheduler is not None:
+        await scheduler.stop()
+    await dispose_engines()
+
+
 # Initialize FastAPI app
 app = FastAPI(
     title=settings.PROJECT_NAME,
     description="Library Management System API",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
+# Replays of create POSTs retried with the same Idempotency-Key; innermost,
+# so that replays are admitted and measured like the first request
+if settings.IDEMPOTENCY_ENABLED:
+    app.add_middleware(IdempotencyMiddleware, router=app.router)
+
+# Per-route-class concurrency limits and load shedding; added before CORS
+# so that 503s still carry CORS headers
+if settings.ADMISSION_ENABLED:
+    limiters = admission.build_limiters()
+    app.add_middleware(admission.AdmissionMiddleware, router=app.router, limiters=limiters)
+    metrics.register_collector(lambda: admission.limiter_metrics(limiters))
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -29,21 +83,51 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Include API routes
-app.include_router(api_router, prefix=settings.API_PREFIX)
+# Per-route latency and DB work, exposed on /metrics
+if settings.METRICS_ENABLED:
+    for each in all_engines():
+        metrics.instrument_engine(each.sync_engine)
+    app.add_middleware(metrics.MetricsMiddleware)
 
+# Reads after a client's own write go to the primary (see app/database/routing.py)
+if replica_engines:
+    app.add_middleware(ReadYourWritesMiddleware)
 
-# Create tables at startup
-@app.on_event("startup")
-async def startup_event():
-    logger.info("Starting up...")
-    Base.metadata.create_all(bind=engine)
-    logger.info("Database tables created.")
+# Outermost, so that every response above the size threshold is compressed
+if settings.COMPRESSION_ENABLED:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+        gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+        zstd_level=settings.COMPRESSION_ZSTD_LEVEL,
+    )
 
 
-@app.on_event("shutdown")
-async def shutdown_event():
-    logger.info("Shutting down...")
+def _pool_and_cache_metrics():
+    pool = get_pool_status()
+    lines = metrics.gauge_lines(
+        "db_pool_connections", "Connections in the pool by state",
+        {
+            (("state", state),): pool[state]
+            for state in ("checked_out", "idle", "overflow")
+            if state in pool
+        },
+    )
+    cache = get_cache().stats()
+    if "hits" in cache:
+        lines += metrics.gauge_lines(
+            "entity_cache_lookups_total", "Entity cache lookups by result",
+            {(("result", "hit"),): cache["hits"], (("result", "miss"),): cache["misses"]},
+            kind="counter",
+        )
+        lines += metrics.gauge_lines("entity_cache_entries", "Entries in the entity cache", {(): cache["entries"]})
+    return lines
+
+
+metrics.register_collector(_pool_and_cache_metrics)
+
+# Include API routes
+app.include_router(api_router, prefix=settings.API_PREFIX)
 
 
 @app.get("/")
@@ -54,6 +138,43 @@ async def root():
     }
 
 
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def read_metrics():
+    return PlainTextResponse(metrics.render_metrics(), media_type="text/plain; version=0.0.4")
+
+
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
\ No newline at end of file
+    health = {"status": "healthy", "pool": get_pool_status(), "cache": get_cache().stats()}
+    if replica_engines:
+        health["replica_pools"] = get_replica_pool_status()
+    return health
+
+
+async def _round_trip_ms(each) -> float:
+    start = time.perf_counter()
+    async with each.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+    return round((time.perf_counter() - start) * 1000, 3)
+
+
+@app.get("/health/db")
+async def health_check_db():
+    """Round-trip the database (and each replica) and report how long it took, with pool stats"""
+    try:
+        latencies = [await _round_trip_ms(each) for each in all_engines()]
+    except Exception as exc:
+        logger.warning("Database health check failed: %s", exc)
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"status": "unhealthy", "error": str(exc), "pool": get_pool_status()},
+        )
+    health = {
+        "status": "healthy",
+        "latency_ms": latencies[0],
+        "pool": get_pool_status(),
+    }
+    if replica_engines:
+        health["replica_latency_ms"] = latencies[1:]
+        health["replica_pools"] = get_replica_pool_status()
+    return health
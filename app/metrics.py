@@ -0,0 +1,240 @@
+# Request and database instrumentation, exposed in Prometheus text format
+
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50, 100)
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by a tuple of label values"""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._series: Dict[Tuple[str, ...], List] = {}
+
+    def observe(self, value: float, *label_values: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted(self._series.items())
+        for label_values, (counts, total, count) in series:
+            labels = _labels(self.labels, label_values)
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_labels(self.labels, label_values, le=bound)} {cumulative}")
+            lines.append(f"{self.name}_bucket{_labels(self.labels, label_values, le='+Inf')} {count}")
+            lines.append(f"{self.name}_sum{labels} {total:.6f}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self._values.items())
+        for label_values, value in values:
+            lines.append(f"{self.name}{_labels(self.labels, label_values)} {value}")
+        return lines
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: Tuple[str, ...], values: Tuple, **extra) -> str:
+    pairs = list(zip(names, values)) + list(extra.items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def gauge_lines(
+    name: str, help: str, values: Dict[Tuple[Tuple[str, str], ...], float], kind: str = "gauge"
+) -> List[str]:
+    """Render a value read at scrape time; keys are (label, value) pairs"""
+    lines = [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+    for pairs, value in values.items():
+        labels = "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}" if pairs else ""
+        lines.append(f"{name}{labels} {value}")
+    return lines
+
+
+request_duration = Histogram(
+    "http_request_duration_seconds", "Time to serve a request", ("method", "route", "status"),
+)
+request_db_statements = Histogram(
+    "http_request_db_statements", "SQL statements executed per request", ("method", "route"),
+    buckets=COUNT_BUCKETS,
+)
+request_db_time = Histogram(
+    "http_request_db_seconds", "Time spent executing SQL per request", ("method", "route"),
+)
+request_pool_wait = Histogram(
+    "http_request_pool_wait_seconds", "Time spent waiting for a pool connection per request",
+    ("method", "route"),
+)
+db_statement_duration = Histogram("db_statement_duration_seconds", "Duration of single SQL statements")
+db_pool_wait = Histogram("db_pool_wait_seconds", "Time to obtain a connection from the pool")
+db_pool_failures = Counter("db_pool_checkout_failures_total", "Failed pool checkouts (timeouts, connect errors)")
+job_runs = Counter(
+    "scheduler_job_runs_total", "Scheduled job runs by result (ok, failed, skipped: not the leader)",
+    ("job", "result"),
+)
+job_duration = Histogram("scheduler_job_duration_seconds", "Time to run a scheduled job", ("job",))
+admission_requests = Counter(
+    "admission_requests_total",
+    "Requests by route class and admission result (admitted, queued, shed_queue_full, shed_deadline)",
+    ("route_class", "result"),
+)
+admission_queue_wait = Histogram(
+    "admission_queue_wait_seconds", "Time queued requests waited for a slot", ("route_class",),
+)
+idempotency_requests = Counter(
+    "idempotency_requests_total",
+    "Requests with an Idempotency-Key by result (stored, replayed, released, in_progress, mismatch)",
+    ("result",),
+)
+
+# Extra collectors (pool, cache, ...) registered by the application
+_collectors: List[Callable[[], List[str]]] = []
+_metrics = [
+    request_duration, request_db_statements, request_db_time, request_pool_wait,
+    db_statement_duration, db_pool_wait, db_pool_failures, job_runs, job_duration,
+    admission_requests, admission_queue_wait, idempotency_requests,
+]
+
+
+def register_collector(collector: Callable[[], List[str]]) -> None:
+    _collectors.append(collector)
+
+
+def render_metrics() -> str:
+    lines: List[str] = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    for collector in _collectors:
+        lines.extend(collector())
+    return "\n".join(lines) + "\n"
+
+
+class RequestStats:
+    """Database work attributed to the request being served"""
+
+    __slots__ = ("statements", "db_time", "pool_wait")
+
+    def __init__(self):
+        self.statements = 0
+        self.db_time = 0.0
+        self.pool_wait = 0.0
+
+
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+
+def record_pool_wait(seconds: float, failed: bool = False) -> None:
+    """Called by the pool for every checkout"""
+    if failed:
+        db_pool_failures.inc()
+    db_pool_wait.observe(seconds)
+    stats = current_request.get()
+    if stats is not None:
+        stats.pool_wait += seconds
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["metrics_query_start"].pop()
+    db_statement_duration.observe(elapsed)
+    stats = current_request.get()
+    if stats is not None:
+        stats.statements += 1
+        stats.db_time += elapsed
+
+
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute
+    connection = exception_context.connection
+    starts = connection.info.get("metrics_query_start") if connection is not None else None
+    if starts:
+        starts.pop()
+
+
+def instrument_engine(sync_engine) -> None:
+    """Time every statement run on ``sync_engine`` (use ``engine.sync_engine`` for async engines)"""
+    if not event.contains(sync_engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(sync_engine, "handle_error", _handle_error)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency and DB work per route template"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = current_request.set(stats)
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            current_request.reset(token)
+            route = scope.get("route")
+            # Route templates keep label cardinality bounded (no raw ids)
+            path = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            request_duration.observe(elapsed, method, path, str(status_code))
+            request_db_statements.observe(stats.statements, method, path)
+            request_db_time.observe(stats.db_time, method, path)
+            request_pool_wait.observe(stats.pool_wait, method, path)
@@ -1,11 +1,49 @@
 # The model will be changed in furture
 
-from sqlalchemy import Column, ForeignKey, Integer, String, Boolean, Date, DateTime, func
+from sqlalchemy import (
+    DDL, BigInteger, Column, ForeignKey, Index, Integer, LargeBinary, String, Boolean, Date,
+    DateTime, and_, event, func, literal_column,
+)
+from sqlalchemy.dialects import postgresql  # noqa: F401  registers to_tsvector()
 from sqlalchemy.orm import relationship
 from datetime import datetime, timedelta
 from app.database.db import Base
 
 
+def search_document(*columns):
+    """tsvector over ``columns`` for full-text search (PostgreSQL only).
+
+    app/crud/search.py builds the same expression, so the planner can
+    match it against the GIN indexes declared below.
+    """
+    text = columns[0]
+    for column in columns[1:]:
+        text = text.op("||")(literal_column("' '")).op("||")(column)
+    return func.to_tsvector(literal_column("'simple'"), text)
+
+
+def trigram_index(name, column, column_name):
+    return Index(
+        name, column,
+        postgresql_using="gin", postgresql_ops={column_name: "gin_trgm_ops"},
+    ).ddl_if(dialect="postgresql")
+
+
+def revision_column(table):
+    """Counter every UPDATE bumps; versions see a change even within one clock tick"""
+    return Column(
+        Integer, nullable=False, default=0, server_default="0",
+        onupdate=literal_column(f"{table}.revision") + 1,
+    )
+
+
+# pg_trgm provides the trigram operators used by the search indexes
+event.listen(
+    Base.metadata,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
+
 
 class Book(Base):
     __tablename__ = "books"
@@ -20,10 +58,21 @@ class Book(Base):
     available = Column(Boolean, default=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    revision = revision_column("books")
 
     # Relationship
     loans = relationship("Loan", back_populates="book")
 
+    __table_args__ = (
+        Index(
+            "ix_books_search", search_document(title, author), postgresql_using="gin"
+        ).ddl_if(dialect="postgresql"),
+        trigram_index("ix_books_title_trgm", title, "title"),
+        trigram_index("ix_books_author_trgm", author, "author"),
+        # Availability filter in id order (listings are keyset-paginated on id)
+        Index("ix_books_available_id", available, id),
+    )
+
 
 class Member(Base):
     __tablename__ = "members"
@@ -36,10 +85,21 @@ class Member(Base):
     address = Column(String)
     registration_date = Column(Date, default=datetime.utcnow)
     active = Column(Boolean, default=True)
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    revision = revision_column("members")
 
     # Relationship
     loans = relationship("Loan", back_populates="member")
 
+    __table_args__ = (
+        Index(
+            "ix_members_search", search_document(first_name, last_name), postgresql_using="gin"
+        ).ddl_if(dialect="postgresql"),
+        trigram_index("ix_members_first_name_trgm", first_name, "first_name"),
+        trigram_index("ix_members_last_name_trgm", last_name, "last_name"),
+        Index("ix_members_active_id", active, id),
+    )
+
 
 class Loan(Base):
     __tablename__ = "loans"
@@ -50,9 +110,73 @@ class Loan(Base):
     loan_date = Column(Date, default=datetime.utcnow)
     due_date = Column(Date, default=lambda: datetime.utcnow() + timedelta(days=14))
     return_date = Column(Date, nullable=True)
+    # Set by the overdue sweep (app/jobs.py) when it first finds the loan past due
+    marked_overdue_at = Column(DateTime(timezone=True), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    revision = revision_column("loans")
 
     # Relationships
     book = relationship("Book", back_populates="loans")
-    member = relationship("Member", back_populates="loans")
\ No newline at end of file
+    member = relationship("Member", back_populates="loans")
+
+    __table_args__ = (
+        # Open loans by due date (partial): drives the overdue queries
+        Index(
+            "ix_loans_open_due_date", due_date, id,
+            postgresql_where=return_date.is_(None),
+            sqlite_where=return_date.is_(None),
+        ),
+        # A member's / a book's loans in id order; also index the FK joins
+        Index("ix_loans_member_id_id", member_id, id),
+        Index("ix_loans_book_id_id", book_id, id),
+        # Open loans in id order (partial): is_returned=false listings
+        Index(
+            "ix_loans_open_id", id,
+            postgresql_where=return_date.is_(None),
+            sqlite_where=return_date.is_(None),
+        ),
+        # Open loans the overdue sweep has not marked yet (partial)
+        Index(
+            "ix_loans_unmarked_due_date", due_date, id,
+            postgresql_where=and_(return_date.is_(None), marked_overdue_at.is_(None)),
+            sqlite_where=and_(return_date.is_(None), marked_overdue_at.is_(None)),
+        ),
+    )
+
+
+class LibraryStat(Base):
+    """A shard of a counter behind GET /stats, kept current by app/crud/stats.py"""
+    __tablename__ = "library_stats"
+
+    name = Column(String(32), primary_key=True)
+    # A counter is the sum of its shards; writers spread over them (see stats.SHARDS)
+    shard = Column(Integer, primary_key=True, default=0, server_default="0")
+    value = Column(BigInteger, nullable=False, default=0, server_default="0")
+    # Date the counts were taken at the last reconciliation ("overdue" is relative to it)
+    as_of = Column(Date)
+    reconciled_at = Column(DateTime(timezone=True))
+
+
+class JobLease(Base):
+    """Which worker may run a scheduled job until ``expires_at`` (app/scheduler.py)"""
+    __tablename__ = "job_leases"
+
+    name = Column(String(64), primary_key=True)
+    holder = Column(String(128), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+
+
+class IdempotencyKey(Base):
+    """First response to a POST sent with an Idempotency-Key (app/idempotency.py)"""
+    __tablename__ = "idempotency_keys"
+
+    path = Column(String(128), primary_key=True)
+    key = Column(String(255), primary_key=True)
+    # Hash of the request, so a key reused for a different request is refused
+    fingerprint = Column(String(64), nullable=False)
+    # NULL while the first request is still being processed
+    status_code = Column(Integer)
+    content_type = Column(String(128))
+    body = Column(LargeBinary)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
@@ -0,0 +1,127 @@
+# Periodic background jobs, started and stopped by the app's lifespan.
+# Every worker runs the scheduler; a leader_only job first takes a lease
+# (app/crud/leases.py) so that across workers and hosts only one of them
+# runs it per interval. Jitter keeps workers started together from
+# contending for the lease, and the database, at the same moment.
+
+import asyncio
+import logging
+import os
+import random
+import socket
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from app import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class Job:
+    """A coroutine function to run every ``interval`` seconds, give or take ``jitter`` of it"""
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable[[], Awaitable[Any]],
+        interval: float,
+        leader_only: bool = True,
+        jitter: float = 0.1,
+    ):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.leader_only = leader_only
+        self.jitter = jitter
+
+    def next_delay(self) -> float:
+        return self.interval * (1 + random.uniform(-self.jitter, self.jitter))
+
+    @property
+    def lease_ttl(self) -> float:
+        # Outlives the longest wait for the next run, so a live leader keeps
+        # its lease; a dead one's lapses after about two intervals
+        return 2 * self.interval * (1 + self.jitter)
+
+
+class Scheduler:
+    def __init__(self, holder: Optional[str] = None):
+        # Names this worker in the job leases
+        self.holder = holder or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.jobs: Dict[str, Job] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._leases: Set[str] = set()
+
+    def add(
+        self,
+        name: str,
+        func: Callable[[], Awaitable[Any]],
+        interval: float,
+        leader_only: bool = True,
+        jitter: float = 0.1,
+    ) -> Optional[Job]:
+        """Schedule ``func``; an interval of 0 or less leaves the job disabled"""
+        if interval <= 0:
+            return None
+        job = self.jobs[name] = Job(name, func, interval, leader_only, jitter)
+        return job
+
+    def start(self) -> None:
+        for job in self.jobs.values():
+            self._tasks.append(asyncio.create_task(self._loop(job), name=f"job:{job.name}"))
+
+    async def stop(self) -> None:
+        """Cancel the jobs (a run in progress is interrupted) and give up the leases"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+        if self._leases:
+            from app.crud import leases
+            from app.database.db import SessionLocal
+
+            try:
+                async with SessionLocal() as db:
+                    for name in sorted(self._leases):
+                        await leases.release(db, name, self.holder)
+            except Exception as exc:
+                # They expire on their own
+                logger.warning("Could not release job leases: %s", exc)
+            self._leases.clear()
+
+    async def _loop(self, job: Job) -> None:
+        while True:
+            await asyncio.sleep(job.next_delay())
+            await self.run_job(job)
+
+    async def _lead(self, job: Job) -> bool:
+        from app.crud import leases
+        from app.database.db import SessionLocal
+
+        async with SessionLocal() as db:
+            leading = await leases.acquire(db, job.name, self.holder, job.lease_ttl)
+        if leading:
+            self._leases.add(job.name)
+        else:
+            self._leases.discard(job.name)
+        return leading
+
+    async def run_job(self, job: Job) -> bool:
+        """Run ``job`` once unless another worker leads it; True if it ran"""
+        try:
+            if job.leader_only and not await self._lead(job):
+                metrics.job_runs.inc(job.name, "skipped")
+                return False
+            start = time.perf_counter()
+            result = await job.func()
+        except Exception as exc:
+            # The next run retries; a failing job must not stop the others
+            metrics.job_runs.inc(job.name, "failed")
+            logger.warning("Job %s failed: %s", job.name, exc)
+            return True
+        elapsed = time.perf_counter() - start
+        metrics.job_runs.inc(job.name, "ok")
+        metrics.job_duration.observe(elapsed, job.name)
+        logger.info("Job %s done in %.1f ms: %s", job.name, elapsed * 1000, result)
+        return True
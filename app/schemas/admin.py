@@ -0,0 +1,13 @@
+# Schemas for the operational /admin endpoints
+from pydantic import BaseModel
+from typing import Optional
+
+
+class SlowQuery(BaseModel):
+    timestamp: str
+    duration_ms: float
+    statement: str
+    parameters: Optional[str] = None
+    executemany: bool = False
+    caller: Optional[str] = None
+    plan: Optional[str] = None
@@ -1,7 +1,7 @@
 # Change will be in the future
 # Future changes will be made to this file
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 
 
@@ -36,4 +36,18 @@ class BookResponse(BookBase):
 
     class Config:
         from_attributes = True
-        populate_by_name = True
\ No newline at end of file
+        populate_by_name = True
+
+class BookImportRow(BaseModel):
+    row: int
+    status: str  # "created", "duplicate" or "invalid"
+    isbn: Optional[str] = None
+    id: Optional[int] = None
+    error: Optional[str] = None
+
+
+class BookImportResult(BaseModel):
+    created: int = 0
+    duplicates: int = 0
+    invalid: int = 0
+    rows: List[BookImportRow] = []
@@ -3,7 +3,7 @@
 # It includes the base model, create and update models, and response models for API interactions.
 # This file is part of a library management system and is licensed under the MIT License.
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import List, Optional
 from datetime import date, datetime
 
 
@@ -18,6 +18,17 @@ class LoanCreate(LoanBase):
     pass
 
 
+# Most books one batch checkout may claim
+MAX_BATCH_CHECKOUT = 50
+
+
+class LoanBatchCreate(BaseModel):
+    member_id: int
+    book_ids: List[int] = Field(..., min_length=1, max_length=MAX_BATCH_CHECKOUT)
+    loan_date: date = Field(default_factory=date.today)
+    due_date: Optional[date] = None
+
+
 class LoanUpdate(BaseModel):
     return_date: Optional[date] = None
 
@@ -25,6 +36,7 @@ class LoanUpdate(BaseModel):
 class LoanResponse(LoanBase):
     id: int
     return_date: Optional[date] = None
+    marked_overdue_at: Optional[datetime] = None
     created_at: datetime
     updated_at: Optional[datetime] = None
 
@@ -39,4 +51,22 @@ class LoanDetailResponse(LoanResponse):
 
     class Config:
         from_attributes = True
-        populate_by_name = True
\ No newline at end of file
+        populate_by_name = True
+
+class OverdueMemberCount(BaseModel):
+    member_id: int
+    member_name: str
+    overdue_count: int
+    oldest_due_date: date
+
+
+class OverdueDaysCount(BaseModel):
+    days_overdue: str
+    overdue_count: int
+
+
+class OverdueSummary(BaseModel):
+    current_date: date
+    total: int
+    by_member: Optional[List[OverdueMemberCount]] = None
+    by_days: Optional[List[OverdueDaysCount]] = None
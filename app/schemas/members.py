@@ -3,7 +3,7 @@
 # It includes the base model, create and update models, and response models for API interactions.
 
 from pydantic import BaseModel, EmailStr, Field
-from typing import Optional
+from typing import List, Optional
 from datetime import date
 
 
@@ -35,4 +35,21 @@ class MemberResponse(MemberBase):
 
     class Config:
         from_attributes = True
-        populate_by_name = True
\ No newline at end of file
+        populate_by_name = True
+
+class CurrentLoan(BaseModel):
+    loan_id: int
+    book_id: int
+    book_title: str
+    loan_date: date
+    due_date: date
+    overdue: bool
+
+
+class MemberSummary(BaseModel):
+    member_id: int
+    member_name: str
+    active_loans: int
+    overdue_loans: int
+    total_loans: int
+    current_loans: List[CurrentLoan]
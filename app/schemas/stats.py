@@ -0,0 +1,15 @@
+# Schemas for the maintained library statistics
+from pydantic import BaseModel
+from typing import Optional
+from datetime import date, datetime
+
+
+class LibraryStats(BaseModel):
+    total_books: int
+    available_books: int
+    active_loans: int
+    # Loans past due as of ``as_of``, the date of the last reconciliation
+    overdue_loans: int
+    active_members: int
+    as_of: Optional[date] = None
+    reconciled_at: Optional[datetime] = None
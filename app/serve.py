@@ -0,0 +1,132 @@
+# Production entry point: a uvicorn supervisor with one worker process per
+# CPU, on uvloop and httptools. run.py stays the single-process dev server.
+#
+#   python -m app.serve
+#   python -m app.serve --workers 4 --max-requests 5000 --port 8080
+#
+# SIGTERM / SIGINT stop the supervisor: each worker stops accepting, lets
+# in-flight requests finish (up to --graceful-timeout) and then runs the
+# lifespan shutdown, which stops the jobs and disposes its engine pool.
+# A worker that exits (after --max-requests, or a crash) is replaced.
+
+import argparse
+import importlib.util
+import logging
+import os
+import random
+from typing import List, Optional
+
+import uvicorn
+from uvicorn.supervisors import Multiprocess
+
+from app.config import settings
+
+logger = logging.getLogger("uvicorn.error")
+
+
+def cpu_count() -> int:
+    """CPUs this process may run on (respects container / taskset limits)"""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def event_loop() -> str:
+    # uvloop does not exist on Windows; fall back to the stdlib loop there
+    return "uvloop" if importlib.util.find_spec("uvloop") else "asyncio"
+
+
+def http_protocol() -> str:
+    return "httptools" if importlib.util.find_spec("httptools") else "h11"
+
+
+class Worker:
+    """What each worker process runs. Picklable, since workers are spawned."""
+
+    def __init__(self, config: uvicorn.Config, max_requests_jitter: int = 0):
+        self.config = config
+        self.max_requests_jitter = max_requests_jitter
+
+    def run(self, sockets=None) -> None:
+        if self.config.limit_max_requests and self.max_requests_jitter:
+            # Workers started together would otherwise all recycle together
+            self.config.limit_max_requests += random.randint(0, self.max_requests_jitter)
+        uvicorn.Server(self.config).run(sockets=sockets)
+
+
+def build_config(args) -> uvicorn.Config:
+    return uvicorn.Config(
+        "app.main:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        loop=event_loop(),
+        http=http_protocol(),
+        lifespan="on",
+        limit_max_requests=args.max_requests or None,
+        timeout_graceful_shutdown=args.graceful_timeout,
+        timeout_keep_alive=args.keep_alive,
+        backlog=args.backlog,
+        proxy_headers=True,
+        forwarded_allow_ips=args.forwarded_allow_ips,
+        access_log=args.access_log,
+        log_level=args.log_level,
+    )
+
+
+def parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Run the API with multiple worker processes")
+    parser.add_argument("--host", default=settings.SERVER_HOST)
+    parser.add_argument("--port", type=int, default=settings.SERVER_PORT)
+    parser.add_argument(
+        "--workers", type=int, default=settings.SERVER_WORKERS,
+        help="worker processes (default: one per CPU)",
+    )
+    parser.add_argument(
+        "--max-requests", type=int, default=settings.SERVER_MAX_REQUESTS,
+        help="recycle a worker after this many requests (0: never)",
+    )
+    parser.add_argument(
+        "--max-requests-jitter", type=int, default=settings.SERVER_MAX_REQUESTS_JITTER,
+        help="add up to this many requests to each worker's limit",
+    )
+    parser.add_argument(
+        "--graceful-timeout", type=float, default=settings.SERVER_GRACEFUL_TIMEOUT,
+        help="seconds a stopping worker waits for in-flight requests",
+    )
+    parser.add_argument("--keep-alive", type=int, default=settings.SERVER_KEEP_ALIVE)
+    parser.add_argument("--backlog", type=int, default=2048)
+    parser.add_argument("--forwarded-allow-ips", default=settings.SERVER_FORWARDED_ALLOW_IPS)
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument("--no-access-log", dest="access_log", action="store_false")
+    args = parser.parse_args(argv)
+    if args.workers <= 0:
+        args.workers = cpu_count()
+    return args
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    # Cache invalidation only reaches the worker that made the write, so the
+    # others would serve (and 304) stale entities for CACHE_TTL_SECONDS.
+    # Workers are spawned and read their settings from the environment.
+    cache_off = args.workers > 1 and "CACHE_ENABLED" not in settings.model_fields_set
+    if cache_off:
+        os.environ["CACHE_ENABLED"] = "false"
+    config = build_config(args)
+    if cache_off:
+        logger.info("Entity cache off with %d workers (set CACHE_ENABLED=true to keep it)", args.workers)
+    logger.info(
+        "Starting %d workers on %s (%s loop, %s parser); up to %d database connections",
+        args.workers, f"{args.host}:{args.port}", config.loop, config.http,
+        args.workers * (settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW),
+    )
+    sock = config.bind_socket()
+    try:
+        Multiprocess(config, target=Worker(config, args.max_requests_jitter).run, sockets=[sock]).run()
+    finally:
+        sock.close()
+
+
+if __name__ == "__main__":
+    main()
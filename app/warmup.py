@@ -0,0 +1,45 @@
+# Startup warm-up. Schema changes are not made here: they run once per
+# deploy with `alembic upgrade head`, so a worker boot only opens
+# connections and compiles the hot statements before serving.
+
+import asyncio
+import logging
+from contextlib import AsyncExitStack
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+logger = logging.getLogger(__name__)
+
+
+async def open_pool_connections(engine: AsyncEngine, count: int) -> int:
+    """Open up to ``count`` connections at once and return them to the pool"""
+    size = getattr(engine.pool, "size", None)
+    count = min(count, size()) if callable(size) else min(count, 1)
+    if count <= 0:
+        return 0
+    # Hold every connection until all are open, so none is reused
+    async with AsyncExitStack() as stack:
+        connections = await asyncio.gather(
+            *(stack.enter_async_context(engine.connect()) for _ in range(count))
+        )
+        await asyncio.gather(*(conn.execute(text("SELECT 1")) for conn in connections))
+    return count
+
+
+async def prime_caches() -> None:
+    """Run the hot read queries once so their compiled SQL is cached"""
+    from app.crud import book as book_crud
+    from app.crud import loan as loan_crud
+    from app.crud import member as member_crud
+    from app.crud import stats as stats_crud
+    from app.database.db import SessionLocal
+
+    async with SessionLocal() as db:
+        await book_crud.get_books(db, limit=1)
+        await book_crud.get_books(db, limit=1, after_id=0)
+        await member_crud.get_members(db, limit=1)
+        await loan_crud.get_loans(db, limit=1)
+        await loan_crud.get_loan_detail(db, 0)
+        await loan_crud.get_overdue_loans(db, limit=1)
+        await stats_crud.get_stats(db)
@@ -0,0 +1,327 @@
+# End-to-end HTTP benchmarks for the API.
+#
+# Seeds a local database, drives the app with concurrent clients and
+# reports latency percentiles and throughput per endpoint as JSON.
+#
+#   python -m benchmarks.http_bench run --output base.json
+#   python -m benchmarks.http_bench run --database-url postgresql://.../bench_db
+#   python -m benchmarks.http_bench run --url http://127.0.0.1:8000   # live server
+#   python -m benchmarks.http_bench compare base.json head.json
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional
+
+WORDS = [
+    "river", "shadow", "garden", "winter", "empire", "glass", "storm", "silver",
+    "harbor", "forest", "machine", "letter", "island", "night", "crown", "desert",
+]
+FIRST_NAMES = ["Ada", "Alan", "Grace", "Linus", "Barbara", "Ken", "Margaret", "Dennis"]
+LAST_NAMES = ["Lovelace", "Turing", "Hopper", "Torvalds", "Liskov", "Thompson", "Hamilton", "Ritchie"]
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = (len(sorted_values) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (rank - low)
+
+
+def summarize(latencies: List[float], errors: int, shed: int, elapsed: float) -> dict:
+    """Latency and throughput of the requests served (shed 503s are only counted)"""
+    values = sorted(latencies)
+    count = len(values)
+    return {
+        "requests": count,
+        "errors": errors,
+        "shed": shed,
+        "rps": round(count / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(sum(values) / count * 1000, 3) if count else 0.0,
+        "p50_ms": round(percentile(values, 50) * 1000, 3),
+        "p95_ms": round(percentile(values, 95) * 1000, 3),
+        "p99_ms": round(percentile(values, 99) * 1000, 3),
+        "max_ms": round(values[-1] * 1000, 3) if count else 0.0,
+    }
+
+
+async def seed(books: int, members: int, loans: int, rng: random.Random) -> None:
+    """Create the schema and fill it with deterministic data"""
+    from sqlalchemy import insert
+    from app.crud import stats
+    from app.database.db import Base, SessionLocal, engine
+    from app.models.models import Book, Loan, Member
+
+    today = date.today()
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+        batch = []
+        for i in range(1, books + 1):
+            batch.append({
+                "title": " ".join(rng.sample(WORDS, 3)).title(),
+                "author": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                "isbn": f"bench-{i:09d}",
+                "publication_year": rng.randint(1900, 2025),
+                "genre": rng.choice(["fiction", "history", "science", "poetry"]),
+                "description": " ".join(rng.choices(WORDS, k=60)),
+                "available": i > loans,
+            })
+            if len(batch) == 5000:
+                await conn.execute(insert(Book), batch)
+                batch = []
+        if batch:
+            await conn.execute(insert(Book), batch)
+        await conn.execute(insert(Member), [
+            {
+                "first_name": rng.choice(FIRST_NAMES),
+                "last_name": rng.choice(LAST_NAMES),
+                "email": f"member{i}@bench.example.com",
+                "registration_date": today,
+                "active": True,
+            }
+            for i in range(1, members + 1)
+        ])
+        # Loans cover the first `loans` books, about a third of them overdue
+        if loans:
+            await conn.execute(insert(Loan), [
+                {
+                    "book_id": i,
+                    "member_id": rng.randint(1, members),
+                    "loan_date": today - timedelta(days=30),
+                    "due_date": today + timedelta(days=rng.randint(-20, 10)),
+                }
+                for i in range(1, loans + 1)
+            ])
+    # Rows inserted directly bypass the maintained /stats counters
+    async with SessionLocal() as db:
+        await stats.reconcile(db)
+
+
+class Scenario:
+    """A named request pattern; ``call`` returns (name, seconds, failed, shed) samples"""
+
+    def __init__(self, name: str, call: Callable[["Scenario", object, random.Random], Awaitable[List]]):
+        self.name = name
+        self.call = call
+
+
+def sample(name: str, start: float, response, failed: bool) -> tuple:
+    # 503 is admission control shedding the request, not a failure to time
+    shed = response.status_code == 503
+    return (name, time.perf_counter() - start, failed and not shed, shed)
+
+
+def build_scenarios(prefix: str, sizes: dict) -> List[Scenario]:
+    books, members, loans = sizes["books"], sizes["members"], sizes["loans"]
+
+    def get(name: str, path: Callable[[random.Random], str]) -> Scenario:
+        async def call(scenario, client, rng):
+            start = time.perf_counter()
+            response = await client.get(prefix + path(rng))
+            return [sample(scenario.name, start, response, response.status_code >= 400)]
+        return Scenario(name, call)
+
+    async def checkout_return(scenario, client, rng):
+        # Books after the seeded loans start out available
+        book_id = rng.randint(loans + 1, books) if books > loans else rng.randint(1, books)
+        start = time.perf_counter()
+        response = await client.post(
+            prefix + "/loans/", json={"book_id": book_id, "member_id": rng.randint(1, members)}
+        )
+        samples = [sample("checkout", start, response, response.status_code >= 500)]
+        if response.status_code == 201:
+            start = time.perf_counter()
+            returned = await client.put(
+                prefix + f"/loans/{response.json()['id']}",
+                json={"return_date": date.today().isoformat()},
+            )
+            samples.append(sample("return", start, returned, returned.status_code >= 400))
+        return samples
+
+    return [
+        get("books_list", lambda rng: "/books/?limit=100"),
+        get("books_list_deep", lambda rng: f"/books/?skip={max(books - 100, 0)}&limit=100"),
+        get("books_page", lambda rng: "/books/page?limit=100"),
+        get("book_detail", lambda rng: f"/books/{rng.randint(1, books)}"),
+        get("books_search", lambda rng: f"/books/search?q={rng.choice(WORDS)}"),
+        get("members_list", lambda rng: "/members/?limit=100"),
+        get("member_detail", lambda rng: f"/members/{rng.randint(1, members)}"),
+        get("loans_list", lambda rng: "/loans/?limit=100"),
+        get("loan_detail", lambda rng: f"/loans/{rng.randint(1, max(loans, 1))}"),
+        get("loans_overdue", lambda rng: "/loans/overdue?limit=100"),
+        get("loans_overdue_summary", lambda rng: "/loans/overdue/summary"),
+        Scenario("checkout_return", checkout_return),
+    ]
+
+
+async def run_scenario(scenario: Scenario, client, requests: int, concurrency: int, seed_value: int) -> Dict[str, dict]:
+    latencies: Dict[str, List[float]] = {}
+    errors: Dict[str, int] = {}
+    shed: Dict[str, int] = {}
+    remaining = requests
+
+    async def worker(worker_id: int):
+        nonlocal remaining
+        rng = random.Random(seed_value * 1000 + worker_id)
+        while remaining > 0:
+            remaining -= 1
+            for name, seconds, failed, was_shed in await scenario.call(scenario, client, rng):
+                served = latencies.setdefault(name, [])
+                errors[name] = errors.get(name, 0) + int(failed)
+                shed[name] = shed.get(name, 0) + int(was_shed)
+                if not was_shed:
+                    served.append(seconds)
+
+    # One unmeasured request warms caches and the connection pool
+    await scenario.call(scenario, client, random.Random(seed_value))
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        name: summarize(values, errors[name], shed[name], elapsed)
+        for name, values in latencies.items()
+    }
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args) -> dict:
+    import httpx
+
+    sizes = {"books": args.books, "members": args.members, "loans": args.loans}
+    rng = random.Random(args.seed)
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=60)
+    else:
+        from app.main import app
+        if not args.no_seed:
+            await seed(args.books, args.members, args.loans, rng)
+        client = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=60
+        )
+
+    scenarios = build_scenarios(args.prefix, sizes)
+    if args.only:
+        scenarios = [scenario for scenario in scenarios if scenario.name in args.only]
+
+    results: Dict[str, dict] = {}
+    async with client:
+        for scenario in scenarios:
+            results.update(
+                await run_scenario(scenario, client, args.requests, args.concurrency, args.seed)
+            )
+            print(f"  {scenario.name:<24} done", file=sys.stderr)
+
+    return {
+        "meta": {
+            "revision": git_revision(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "database": "live server" if args.url else os.environ["DATABASE_URL"].split(":", 1)[0],
+            "target": args.url or "in-process",
+            "concurrency": args.concurrency,
+            "requests_per_scenario": args.requests,
+            "seed": args.seed,
+            **sizes,
+        },
+        "results": results,
+    }
+
+
+def print_results(report: dict) -> None:
+    print(f"{'endpoint':<24}{'req':>7}{'err':>6}{'shed':>6}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, row in report["results"].items():
+        print(
+            f"{name:<24}{row['requests']:>7}{row['errors']:>6}{row.get('shed', 0):>6}{row['rps']:>10.1f}"
+            f"{row['p50_ms']:>10.2f}{row['p95_ms']:>10.2f}{row['p99_ms']:>10.2f}"
+        )
+
+
+def compare(base_path: str, head_path: str) -> None:
+    with open(base_path) as f:
+        base = json.load(f)
+    with open(head_path) as f:
+        head = json.load(f)
+
+    def delta(old, new):
+        return f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+
+    print(f"base {base['meta'].get('revision')}  head {head['meta'].get('revision')}")
+    print(f"{'endpoint':<24}{'rps':>10}{'p50':>10}{'p95':>10}{'p99':>10}")
+    for name, new in head["results"].items():
+        old = base["results"].get(name)
+        if old is None:
+            print(f"{name:<24}{'(new)':>10}")
+            continue
+        print(
+            f"{name:<24}{delta(old['rps'], new['rps']):>10}{delta(old['p50_ms'], new['p50_ms']):>10}"
+            f"{delta(old['p95_ms'], new['p95_ms']):>10}{delta(old['p99_ms'], new['p99_ms']):>10}"
+        )
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="seed a database and benchmark every endpoint")
+    run_parser.add_argument("--database-url", help="database to seed (default: a temporary SQLite file)")
+    run_parser.add_argument("--url", help="benchmark a running server instead of the in-process app")
+    run_parser.add_argument("--prefix", default="/api/v1", help="API prefix the routes are mounted under")
+    run_parser.add_argument("--books", type=int, default=5000)
+    run_parser.add_argument("--members", type=int, default=500)
+    run_parser.add_argument("--loans", type=int, default=1500)
+    run_parser.add_argument("--requests", type=int, default=500, help="requests per scenario")
+    run_parser.add_argument("--concurrency", type=int, default=20)
+    run_parser.add_argument("--seed", type=int, default=42)
+    run_parser.add_argument("--only", nargs="*", help="scenario names to run")
+    run_parser.add_argument("--no-seed", action="store_true", help="reuse the data already in the database")
+    run_parser.add_argument("--output", help="write the JSON report here")
+
+    compare_parser = commands.add_parser("compare", help="compare two JSON reports")
+    compare_parser.add_argument("base")
+    compare_parser.add_argument("head")
+
+    args = parser.parse_args(argv)
+    if args.command == "compare":
+        compare(args.base, args.head)
+        return
+
+    # The app reads its settings at import time, so configure them first
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    elif not args.url:
+        os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.gettempdir(), "library_bench.db")
+    os.environ.setdefault("DB_ECHO", "false")
+    # In process, measure the endpoints rather than the admission limits,
+    # which shed most of what --concurrency sends to the small classes
+    os.environ.setdefault("ADMISSION_ENABLED", "false")
+    logging.disable(logging.INFO)
+
+    report = asyncio.run(run(args))
+    print_results(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+# Query-plan check for the crud layer.
+#
+# Seeds a local database, runs the filtered crud queries the API issues,
+# captures the SQL they send and EXPLAINs each statement. Exits non-zero
+# if any table is read with a full scan instead of an index.
+# tests/test_query_plans.py runs the same checks under pytest.
+#
+#   python -m benchmarks.query_plans
+#   python -m benchmarks.query_plans --database-url postgresql://.../plan_db
+
+import argparse
+import asyncio
+import logging
+import os
+import random
+import sys
+import tempfile
+from datetime import date
+from typing import Callable, List, Tuple
+
+
+def build_checks() -> List[Tuple[str, Callable]]:
+    """(name, coroutine function of a session) for every query to check"""
+    from app.crud import book as book_crud
+    from app.crud import loan as loan_crud
+    from app.crud import member as member_crud
+    from app.crud import stats as stats_crud
+
+    today = date.today()
+    return [
+        ("get_book", lambda db: book_crud.get_book(db, 7)),
+        ("get_book_by_isbn", lambda db: book_crud.get_book_by_isbn(db, "bench-000000007")),
+        ("get_books available", lambda db: book_crud.get_books(db, available=True)),
+        ("get_books unavailable page", lambda db: book_crud.get_books(db, after_id=10, available=False)),
+        ("get_member", lambda db: member_crud.get_member(db, 3)),
+        ("get_member_by_email", lambda db: member_crud.get_member_by_email(db, "member3@bench.example.com")),
+        ("get_members active", lambda db: member_crud.get_members(db, active=True)),
+        ("get_member_summaries", lambda db: member_crud.get_member_summaries(db, [3, 4, 5])),
+        ("get_loan", lambda db: loan_crud.get_loan(db, 5)),
+        ("get_loan_detail", lambda db: loan_crud.get_loan_detail(db, 5)),
+        ("get_loans by member", lambda db: loan_crud.get_loans(db, member_id=3)),
+        ("get_loans by member page", lambda db: loan_crud.get_loans(db, after_id=10, member_id=3)),
+        ("get_loans by book", lambda db: loan_crud.get_loans(db, book_id=5)),
+        ("get_loans open", lambda db: loan_crud.get_loans(db, is_returned=False)),
+        ("get_loans open by member", lambda db: loan_crud.get_loans(db, member_id=3, is_returned=False)),
+        ("get_overdue_loans", lambda db: loan_crud.get_overdue_loans(db, today, limit=100)),
+        ("count_overdue_loans", lambda db: loan_crud.count_overdue_loans(db, today)),
+        ("overdue_counts_by_member", lambda db: loan_crud.overdue_counts_by_member(db, today)),
+        ("overdue_counts_by_days", lambda db: loan_crud.overdue_counts_by_days(db, today)),
+        ("get_stats", lambda db: stats_crud.get_stats(db)),
+    ]
+
+
+def full_scans(dialect: str, plan: List[str]) -> List[str]:
+    """Plan lines that read a whole table without an index"""
+    if dialect == "sqlite":
+        # "SCAN t" is a table scan; "SCAN t USING ... INDEX" reads an index
+        # (or a partial index) in order, which is what keyset listings want.
+        # Scanning an already materialised subquery reads no table at all.
+        derived = {
+            line.split()[1] for line in plan
+            if line.lstrip().startswith(("MATERIALIZE", "CO-ROUTINE"))
+        }
+        return [
+            line for line in plan
+            if line.lstrip().startswith("SCAN") and "INDEX" not in line
+            and "SUBQUERY" not in line and line.split()[1] not in derived
+        ]
+    return [line for line in plan if "Seq Scan" in line]
+
+
+def explain(conn, statement: str, parameters) -> List[str]:
+    """Plan of ``statement`` as text lines, on a raw DBAPI connection"""
+    dialect = conn.dialect.name
+    cursor = conn.connection.cursor()
+    try:
+        if dialect == "postgresql":
+            # Seeded tables are small enough that a seq scan is always the
+            # cheapest plan; disabling it shows whether an index is usable
+            cursor.execute("SET enable_seqscan = off")
+            cursor.execute("EXPLAIN " + statement, parameters)
+            return [row[0] for row in cursor.fetchall()]
+        cursor.execute("EXPLAIN QUERY PLAN " + statement, parameters)
+        return [row[-1] for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+
+async def collect_plans(
+    books: int = 2000, members: int = 200, loans: int = 600, seed_value: int = 42
+) -> List[Tuple[str, str, List[str], List[str]]]:
+    """
+    Seed the database, run every check and EXPLAIN the SELECTs it sent:
+    (check name, statement, plan lines, full-scan lines) per statement.
+    """
+    from sqlalchemy import event
+
+    from app.cache import NullCache, set_cache_backend
+    from app.database.db import SessionLocal, engine, get_sync_engine
+    from benchmarks.http_bench import seed
+
+    await seed(books, members, loans, random.Random(seed_value))
+    # Entity-cache hits would skip the queries under test
+    set_cache_backend(NullCache())
+
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        captured.append((statement, parameters))
+
+    event.listen(engine.sync_engine, "before_cursor_execute", capture)
+    statements = []
+    try:
+        for name, check in build_checks():
+            captured.clear()
+            async with SessionLocal() as db:
+                await check(db)
+            statements.extend(
+                (name, statement, parameters)
+                for statement, parameters in captured
+                if statement.lstrip().upper().startswith(("SELECT", "WITH"))
+            )
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", capture)
+    await engine.dispose()
+
+    plans = []
+    with get_sync_engine().connect() as conn:
+        for name, statement, parameters in statements:
+            plan = explain(conn, statement, parameters)
+            plans.append((name, statement, plan, full_scans(conn.dialect.name, plan)))
+    return plans
+
+
+async def run(args) -> int:
+    plans = await collect_plans(args.books, args.members, args.loans, args.seed)
+    failures = 0
+    for name, statement, plan, scans in plans:
+        print(f"{'FAIL' if scans else 'ok  '}  {name}")
+        if scans or args.verbose:
+            print("      " + " ".join(statement.split()))
+            for line in plan:
+                print(f"        {line}")
+        failures += bool(scans)
+
+    print(f"\n{len(plans)} statements, {failures} with full table scans")
+    return 1 if failures else 0
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--database-url", help="database to seed (default: a temporary SQLite file)")
+    parser.add_argument("--books", type=int, default=2000)
+    parser.add_argument("--members", type=int, default=200)
+    parser.add_argument("--loans", type=int, default=600)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("-v", "--verbose", action="store_true", help="print every plan")
+    args = parser.parse_args(argv)
+
+    # The app reads its settings at import time, so configure them first
+    os.environ["DATABASE_URL"] = args.database_url or (
+        "sqlite:///" + os.path.join(tempfile.gettempdir(), "library_plans.db")
+    )
+    os.environ.setdefault("DB_ECHO", "false")
+    logging.disable(logging.INFO)
+
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
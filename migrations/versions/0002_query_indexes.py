@@ -0,0 +1,81 @@
+"""Search, overdue and listing indexes
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 09:00:00
+
+The indexes declared in models.py for search (PostgreSQL only), the
+overdue queries and the filtered listings.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+OPEN_LOAN = sa.text("return_date IS NULL")
+
+# (index, table, columns) of the pg_trgm indexes
+TRIGRAM_INDEXES = [
+    ("ix_books_title_trgm", "books", "title"),
+    ("ix_books_author_trgm", "books", "author"),
+    ("ix_members_first_name_trgm", "members", "first_name"),
+    ("ix_members_last_name_trgm", "members", "last_name"),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        # Must match search_document() in models.py for the planner to use them
+        op.execute(
+            "CREATE INDEX IF NOT EXISTS ix_books_search ON books "
+            "USING gin (to_tsvector('simple', (title || ' ') || author))"
+        )
+        op.execute(
+            "CREATE INDEX IF NOT EXISTS ix_members_search ON members "
+            "USING gin (to_tsvector('simple', (first_name || ' ') || last_name))"
+        )
+        for name, table, column in TRIGRAM_INDEXES:
+            op.create_index(
+                name, table, [column], postgresql_using="gin",
+                postgresql_ops={column: "gin_trgm_ops"}, if_not_exists=True,
+            )
+
+    op.create_index("ix_books_available_id", "books", ["available", "id"], if_not_exists=True)
+    op.create_index("ix_members_active_id", "members", ["active", "id"], if_not_exists=True)
+    op.create_index(
+        "ix_loans_open_due_date", "loans", ["due_date", "id"],
+        postgresql_where=OPEN_LOAN, sqlite_where=OPEN_LOAN, if_not_exists=True,
+    )
+    op.create_index("ix_loans_member_id_id", "loans", ["member_id", "id"], if_not_exists=True)
+    op.create_index("ix_loans_book_id_id", "loans", ["book_id", "id"], if_not_exists=True)
+    op.create_index(
+        "ix_loans_open_id", "loans", ["id"],
+        postgresql_where=OPEN_LOAN, sqlite_where=OPEN_LOAN, if_not_exists=True,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name, table in [
+        ("ix_loans_open_id", "loans"),
+        ("ix_loans_book_id_id", "loans"),
+        ("ix_loans_member_id_id", "loans"),
+        ("ix_loans_open_due_date", "loans"),
+        ("ix_members_active_id", "members"),
+        ("ix_books_available_id", "books"),
+    ]:
+        op.drop_index(name, table_name=table)
+    if op.get_bind().dialect.name == "postgresql":
+        for name, table, _ in TRIGRAM_INDEXES:
+            op.drop_index(name, table_name=table)
+        op.drop_index("ix_members_search", table_name="members")
+        op.drop_index("ix_books_search", table_name="books")
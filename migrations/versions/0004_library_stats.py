@@ -0,0 +1,53 @@
+"""Add library_stats counters
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 13:00:00
+
+Counters served by GET /stats, seeded from the current tables. The API
+keeps them up to date on every write and reconciles them periodically.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Must match _counts() in app/crud/stats.py
+SEED_COUNTS = {
+    "total_books": "SELECT count(*) FROM books",
+    "available_books": "SELECT count(*) FROM books WHERE available IS true",
+    "active_loans": "SELECT count(*) FROM loans WHERE return_date IS NULL",
+    "overdue_loans": (
+        "SELECT count(*) FROM loans WHERE return_date IS NULL AND due_date < CURRENT_DATE"
+    ),
+    "active_members": "SELECT count(*) FROM members WHERE active IS true",
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "library_stats",
+        sa.Column("name", sa.String(length=32), nullable=False),
+        sa.Column("value", sa.BigInteger(), server_default="0", nullable=False),
+        sa.Column("as_of", sa.Date(), nullable=True),
+        sa.Column("reconciled_at", sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint("name"),
+    )
+    for name, count in SEED_COUNTS.items():
+        op.execute(
+            "INSERT INTO library_stats (name, value, as_of, reconciled_at) "
+            f"SELECT '{name}', ({count}), CURRENT_DATE, CURRENT_TIMESTAMP"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("library_stats")
@@ -0,0 +1,46 @@
+"""Add job_leases and loans.marked_overdue_at
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 15:00:00
+
+Leases let one worker at a time run each scheduled job; the overdue
+sweep records when it first found a loan past due.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: Union[str, None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+UNMARKED_OPEN_LOAN = sa.text("return_date IS NULL AND marked_overdue_at IS NULL")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "job_leases",
+        sa.Column("name", sa.String(length=64), nullable=False),
+        sa.Column("holder", sa.String(length=128), nullable=False),
+        sa.Column("expires_at", sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint("name"),
+    )
+    op.add_column("loans", sa.Column("marked_overdue_at", sa.DateTime(timezone=True), nullable=True))
+    op.create_index(
+        "ix_loans_unmarked_due_date", "loans", ["due_date", "id"],
+        postgresql_where=UNMARKED_OPEN_LOAN, sqlite_where=UNMARKED_OPEN_LOAN,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_loans_unmarked_due_date", table_name="loans")
+    with op.batch_alter_table("loans") as batch_op:
+        batch_op.drop_column("marked_overdue_at")
+    op.drop_table("job_leases")
@@ -0,0 +1,37 @@
+"""Add books/members/loans.revision
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 19:00:00
+
+Update counters for conditional GETs: updated_at alone misses a second
+update within the same timestamp tick (one second on SQLite).
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0007"
+down_revision: Union[str, None] = "0006"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ("books", "members", "loans")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table in TABLES:
+        op.add_column(
+            table, sa.Column("revision", sa.Integer(), nullable=False, server_default="0")
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in TABLES:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column("revision")
@@ -0,0 +1,69 @@
+"""Shard the library_stats counters
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18 20:00:00
+
+Each counter becomes SHARDS rows keyed by (name, shard) and summed on
+read, so concurrent writes no longer all update one row per counter.
+The current values stay in shard 0.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0008"
+down_revision: Union[str, None] = "0007"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Must match SHARDS in app/crud/stats.py
+SHARDS = 8
+
+
+def _library_stats(*primary_key):
+    """library_stats with its shard column, for SQLite's table rebuild"""
+    return sa.Table(
+        "library_stats",
+        sa.MetaData(),
+        sa.Column("name", sa.String(length=32), nullable=False),
+        sa.Column("value", sa.BigInteger(), server_default="0", nullable=False),
+        sa.Column("as_of", sa.Date(), nullable=True),
+        sa.Column("reconciled_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("shard", sa.Integer(), server_default="0", nullable=False),
+        sa.PrimaryKeyConstraint(*primary_key, name="library_stats_pkey"),
+    )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "library_stats", sa.Column("shard", sa.Integer(), server_default="0", nullable=False)
+    )
+    with op.batch_alter_table("library_stats", copy_from=_library_stats("name")) as batch_op:
+        batch_op.drop_constraint("library_stats_pkey", type_="primary")
+        batch_op.create_primary_key("library_stats_pkey", ["name", "shard"])
+    for shard in range(1, SHARDS):
+        op.execute(
+            "INSERT INTO library_stats (name, shard, value, as_of, reconciled_at) "
+            f"SELECT name, {shard}, 0, as_of, reconciled_at FROM library_stats WHERE shard = 0"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute(
+        "UPDATE library_stats SET value = "
+        "(SELECT sum(shards.value) FROM library_stats AS shards "
+        "WHERE shards.name = library_stats.name) WHERE shard = 0"
+    )
+    op.execute("DELETE FROM library_stats WHERE shard <> 0")
+    with op.batch_alter_table(
+        "library_stats", copy_from=_library_stats("name", "shard")
+    ) as batch_op:
+        batch_op.drop_constraint("library_stats_pkey", type_="primary")
+        batch_op.create_primary_key("library_stats_pkey", ["name"])
+        batch_op.drop_column("shard")
@@ -1,3 +1,5 @@
+# Development server (auto-reload, one process). For production use
+# `python -m app.serve`, which runs one worker per CPU.
 import uvicorn
 
 if __name__ == "__main__":
@@ -0,0 +1,30 @@
+# Every filtered crud query must be answered from an index: a query or
+# index change that brings back a full table scan fails here.
+
+import asyncio
+import logging
+import os
+import tempfile
+
+# The app reads its settings at import time; always use a throwaway SQLite
+# file, since seeding drops and recreates every table
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.gettempdir(), "library_plans_test.db")
+os.environ.setdefault("DB_ECHO", "false")
+logging.disable(logging.INFO)
+
+import pytest  # noqa: E402
+
+from benchmarks.query_plans import build_checks, collect_plans  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def plans():
+    return asyncio.run(collect_plans())
+
+
+@pytest.mark.parametrize("check", [name for name, _ in build_checks()])
+def test_query_uses_indexes(plans, check):
+    statements = [(statement, plan, scans) for name, statement, plan, scans in plans if name == check]
+    assert statements, f"{check} sent no SELECT"
+    for statement, plan, scans in statements:
+        assert not scans, f"full table scan in {' '.join(statement.split())}:\n" + "\n".join(plan)